@@ -24,7 +24,8 @@ export default async function MangaPage({ params }: { params: { id: string } })
     .from('chapters')
     .select('*')
     .eq('content_id', params.id)
-    .order('chapter_number', { ascending: true });
+    .order('sort_key', { ascending: true })
+    .order('id', { ascending: true });
 
   if (chaptersError) {
     console.error('Error fetching chapters:', chaptersError);
@@ -388,6 +388,17 @@ export default function HomePage() {
   )
 }
 
+type CoverRendition = { format: string; width: number; height: number; url: string }
+
+// Smallest WebP cover rendition at least `width` pixels wide (scraper/render_images.py),
+// falling back to the largest one and then to the full-size cover
+function coverSrc(content: { cover_image?: string | null; cover_renditions?: CoverRendition[] | null }, width: number) {
+  const webp = (content.cover_renditions ?? [])
+    .filter((rendition) => rendition.format === "webp")
+    .sort((a, b) => a.width - b.width)
+  return (webp.find((rendition) => rendition.width >= width) ?? webp[webp.length - 1])?.url ?? content.cover_image
+}
+
 function ContentCard({
   content,
   user,
@@ -418,7 +429,7 @@ function ContentCard({
                 </div>
               )}
               <Image
-                src={content.cover_image || "/placeholder.svg?height=300&width=200"}
+                src={coverSrc(content, 400) || "/placeholder.svg?height=300&width=200"}
                 alt={content.title}
                 width={200}
                 height={300}
@@ -512,7 +523,7 @@ function ContinueCard({ item }: { item: any }) {
           <div className="flex space-x-4">
             <div className="relative overflow-hidden rounded">
               <Image
-                src={item.content.cover_image || "/placeholder.svg?height=120&width=80"}
+                src={coverSrc(item.content, 160) || "/placeholder.svg?height=120&width=80"}
                 alt={item.content.title}
                 width={80}
                 height={120}
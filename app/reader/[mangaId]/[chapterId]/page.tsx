@@ -27,14 +27,31 @@ export default async function ReaderPage({
     return <div>Chapter not found</div>;
   }
 
-  // Fetch pages from MangaDex
-  const mangaDexChapterId = chapter.source_url.split('/').pop();
-  const response = await fetch(`https://api.mangadex.org/at-home/server/${mangaDexChapterId}`);
-  const chapterData = await response.json();
-  
-  const pages = chapterData.chapter.data.map((page: string) => 
-    `${chapterData.baseUrl}/data/${chapterData.chapter.hash}/${page}`
-  );
+  // Stored (mirrored) pages when the chapter has them, otherwise fetch pages from MangaDex
+  let pages: string[] = chapter.pages ?? [];
+  if (pages.length > 0) {
+    // Prefer the reader-width WebP renditions of mirrored pages (scraper/render_images.py)
+    const { data: renditions } = await supabase
+      .from('image_renditions')
+      .select('source_url, width, url')
+      .in('source_url', pages)
+      .eq('format', 'webp')
+      .lte('width', 960);
+    const best = new Map<string, { width: number; url: string }>();
+    for (const rendition of renditions ?? []) {
+      const current = best.get(rendition.source_url);
+      if (!current || rendition.width > current.width) best.set(rendition.source_url, rendition);
+    }
+    pages = pages.map((page) => best.get(page)?.url ?? page);
+  } else {
+    const mangaDexChapterId = chapter.source_url.split('/').pop();
+    const response = await fetch(`https://api.mangadex.org/at-home/server/${mangaDexChapterId}`);
+    const chapterData = await response.json();
+
+    pages = chapterData.chapter.data.map((page: string) =>
+      `${chapterData.baseUrl}/data/${chapterData.chapter.hash}/${page}`
+    );
+  }
 
   return <ReaderClient chapter={{ ...chapter, pages }} mangaId={params.mangaId} />;
 } 
\ No newline at end of file
@@ -0,0 +1,94 @@
+-- Benchmark the chapter count triggers on a local Postgres:
+--
+--     psql -d postgres -f database/benchmarks/chapter_count_trigger.sql
+--
+-- One series gets 2,000 chapters upserted in 50-row batches (like
+-- MangaDexScraper.upsert_rows) and then upserted again (a re-crawl), first
+-- with the old per-row COUNT(*) trigger and then after applying the
+-- statement-level migration. Everything lives in the chapter_count_bench
+-- schema, which is dropped at the end.
+\set ON_ERROR_STOP on
+SET client_min_messages = notice;
+
+DROP SCHEMA IF EXISTS chapter_count_bench CASCADE;
+CREATE SCHEMA chapter_count_bench;
+SET search_path = chapter_count_bench, public;
+
+CREATE TABLE content (
+    id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
+    source_url TEXT UNIQUE,
+    total_chapters INTEGER DEFAULT 0
+);
+
+CREATE TABLE chapters (
+    id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
+    content_id UUID REFERENCES content(id) ON DELETE CASCADE,
+    chapter_number TEXT NOT NULL,
+    source_url TEXT UNIQUE,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX chapters_content_id_idx ON chapters(content_id);
+
+CREATE FUNCTION upsert_series(label TEXT, total INTEGER, batch_size INTEGER)
+RETURNS VOID AS $$
+DECLARE
+    series UUID;
+    started TIMESTAMP WITH TIME ZONE;
+    pass TEXT;
+    seconds DOUBLE PRECISION;
+BEGIN
+    TRUNCATE chapters, content;
+    INSERT INTO content (source_url) VALUES ('https://example.org/series') RETURNING id INTO series;
+
+    FOREACH pass IN ARRAY ARRAY['insert', 're-crawl'] LOOP
+        started := clock_timestamp();
+        FOR batch_start IN 0..total - 1 BY batch_size LOOP
+            INSERT INTO chapters (content_id, chapter_number, source_url)
+            SELECT series, number::TEXT, 'https://example.org/chapter/' || number
+            FROM generate_series(batch_start, LEAST(batch_start + batch_size, total) - 1) AS number
+            ON CONFLICT (source_url) DO UPDATE
+            SET chapter_number = EXCLUDED.chapter_number, updated_at = CURRENT_TIMESTAMP;
+        END LOOP;
+        seconds := EXTRACT(EPOCH FROM clock_timestamp() - started);
+
+        RAISE NOTICE '% %: % chapters in % ms (% rows/s), total_chapters = %',
+            label, pass, total, round((seconds * 1000)::NUMERIC, 1), round((total / seconds)::NUMERIC),
+            (SELECT total_chapters FROM content WHERE id = series);
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- The per-row trigger from before the migration
+CREATE FUNCTION update_content_total_chapters()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' OR TG_OP = 'UPDATE' THEN
+        UPDATE content
+        SET total_chapters = (SELECT COUNT(*) FROM chapters WHERE content_id = NEW.content_id)
+        WHERE id = NEW.content_id;
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE content
+        SET total_chapters = (SELECT COUNT(*) FROM chapters WHERE content_id = OLD.content_id)
+        WHERE id = OLD.content_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER update_content_chapters_count
+    AFTER INSERT OR UPDATE OR DELETE ON chapters
+    FOR EACH ROW
+    EXECUTE FUNCTION update_content_total_chapters();
+
+SELECT upsert_series('per-row', 2000, 50);
+
+\ir ../migrations/20240601_statement_level_chapter_count.sql
+
+SELECT upsert_series('per-statement', 2000, 50);
+
+-- Check the deltas against a recount, and deletes going through the trigger
+DELETE FROM chapters WHERE chapter_number::INTEGER % 4 = 0;
+SELECT total_chapters AS after_deleting_500, recount_content_chapters() AS titles_recounted FROM content;
+
+RESET search_path;
+DROP SCHEMA chapter_count_bench CASCADE;
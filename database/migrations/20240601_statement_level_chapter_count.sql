@@ -0,0 +1,99 @@
+-- Maintain content.total_chapters with statement-level triggers.
+-- The per-row trigger re-counted every chapter of a title for each inserted
+-- row, so a 50-row batch ran 50 COUNT(*)s and 50 content updates. These
+-- triggers read the statement's transition table and apply one +n/-n delta
+-- per title instead.
+DROP TRIGGER IF EXISTS update_content_chapters_count ON chapters;
+DROP TRIGGER IF EXISTS content_chapters_count_insert ON chapters;
+DROP TRIGGER IF EXISTS content_chapters_count_update ON chapters;
+DROP TRIGGER IF EXISTS content_chapters_count_delete ON chapters;
+
+CREATE OR REPLACE FUNCTION update_content_total_chapters()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE content
+        SET total_chapters = COALESCE(content.total_chapters, 0) + delta.chapters
+        FROM (
+            SELECT content_id, COUNT(*) AS chapters
+            FROM new_chapters
+            WHERE content_id IS NOT NULL
+            GROUP BY content_id
+        ) delta
+        WHERE content.id = delta.content_id;
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE content
+        SET total_chapters = GREATEST(COALESCE(content.total_chapters, 0) - delta.chapters, 0)
+        FROM (
+            SELECT content_id, COUNT(*) AS chapters
+            FROM old_chapters
+            WHERE content_id IS NOT NULL
+            GROUP BY content_id
+        ) delta
+        WHERE content.id = delta.content_id;
+    ELSIF TG_OP = 'UPDATE' THEN
+        -- Only chapters moved to another title change any count
+        UPDATE content
+        SET total_chapters = GREATEST(COALESCE(content.total_chapters, 0) + delta.chapters, 0)
+        FROM (
+            SELECT content_id, SUM(change) AS chapters
+            FROM (
+                SELECT content_id, 1 AS change FROM new_chapters
+                UNION ALL
+                SELECT content_id, -1 AS change FROM old_chapters
+            ) moved
+            WHERE content_id IS NOT NULL
+            GROUP BY content_id
+            HAVING SUM(change) <> 0
+        ) delta
+        WHERE content.id = delta.content_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Transition tables need one trigger per event
+CREATE TRIGGER content_chapters_count_insert
+    AFTER INSERT ON chapters
+    REFERENCING NEW TABLE AS new_chapters
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION update_content_total_chapters();
+
+CREATE TRIGGER content_chapters_count_update
+    AFTER UPDATE ON chapters
+    REFERENCING OLD TABLE AS old_chapters NEW TABLE AS new_chapters
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION update_content_total_chapters();
+
+CREATE TRIGGER content_chapters_count_delete
+    AFTER DELETE ON chapters
+    REFERENCING OLD TABLE AS old_chapters
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION update_content_total_chapters();
+
+-- Recount total_chapters from scratch, for all titles or the given ones.
+-- Returns the number of titles whose count was wrong.
+CREATE OR REPLACE FUNCTION recount_content_chapters(content_ids UUID[] DEFAULT NULL)
+RETURNS INTEGER AS $$
+DECLARE
+    fixed INTEGER;
+BEGIN
+    UPDATE content
+    SET total_chapters = counts.chapters
+    FROM (
+        SELECT content.id, COUNT(chapters.id) AS chapters
+        FROM content
+        LEFT JOIN chapters ON chapters.content_id = content.id
+        WHERE content_ids IS NULL OR content.id = ANY(content_ids)
+        GROUP BY content.id
+    ) counts
+    WHERE content.id = counts.id
+    AND content.total_chapters IS DISTINCT FROM counts.chapters;
+
+    GET DIAGNOSTICS fixed = ROW_COUNT;
+    RETURN fixed;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Counts written by the scrapers may have drifted; start the deltas from exact values
+SELECT recount_content_chapters();
@@ -0,0 +1,89 @@
+-- Deferred, batched search_vector maintenance.
+-- search_hash records the text a row's search_vector was built from, so the
+-- trigger can skip rows whose text didn't change (re-crawl upserts rewrite
+-- every column). While search vectors are deferred (bulk imports) the
+-- trigger only clears search_hash on rows whose text changed, and
+-- rebuild_search_vectors() indexes those afterwards in set-based batches.
+ALTER TABLE content ADD COLUMN IF NOT EXISTS search_hash TEXT;
+CREATE INDEX IF NOT EXISTS content_search_stale_idx ON content(id) WHERE search_hash IS NULL;
+
+CREATE TABLE IF NOT EXISTS search_vector_settings (
+    id BOOLEAN PRIMARY KEY DEFAULT true CHECK (id),
+    deferred BOOLEAN NOT NULL DEFAULT false
+);
+INSERT INTO search_vector_settings (id) VALUES (true) ON CONFLICT (id) DO NOTHING;
+-- Only the service role (which bypasses RLS) sees the setting
+ALTER TABLE search_vector_settings ENABLE ROW LEVEL SECURITY;
+
+CREATE OR REPLACE FUNCTION content_search_hash(row_data content)
+RETURNS TEXT AS $$
+    SELECT md5(concat_ws(E'\x1f',
+        row_data.title,
+        row_data.description,
+        array_to_string(row_data.tags, ' '),
+        array_to_string(row_data.genres, ' '),
+        array_to_string(row_data.authors, ' '),
+        array_to_string(row_data.artists, ' ')
+    ));
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION content_search_vector(row_data content)
+RETURNS tsvector AS $$
+    SELECT setweight(to_tsvector('english', COALESCE(row_data.title, '')), 'A')
+        || setweight(to_tsvector('english', COALESCE(row_data.description, '')), 'B')
+        || setweight(to_tsvector('english', COALESCE(array_to_string(row_data.tags, ' '), '')), 'C')
+        || setweight(to_tsvector('english', COALESCE(array_to_string(row_data.genres, ' '), '')), 'C')
+        || setweight(to_tsvector('english', COALESCE(array_to_string(row_data.authors, ' '), '')), 'B')
+        || setweight(to_tsvector('english', COALESCE(array_to_string(row_data.artists, ' '), '')), 'B');
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION update_search_vector()
+RETURNS TRIGGER AS $$
+DECLARE
+    text_hash TEXT;
+BEGIN
+    text_hash := content_search_hash(NEW);
+    IF NEW.search_hash IS NOT DISTINCT FROM text_hash THEN
+        RETURN NEW;
+    END IF;
+
+    IF (SELECT deferred FROM search_vector_settings) THEN
+        -- Left for rebuild_search_vectors()
+        NEW.search_hash := NULL;
+    ELSE
+        NEW.search_vector := content_search_vector(NEW);
+        NEW.search_hash := text_hash;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION set_search_vector_deferred(deferred BOOLEAN)
+RETURNS VOID AS $$
+    UPDATE search_vector_settings SET deferred = set_search_vector_deferred.deferred WHERE id;
+$$ LANGUAGE sql;
+
+-- Rebuild up to batch_size stale search vectors; call until it returns 0
+CREATE OR REPLACE FUNCTION rebuild_search_vectors(batch_size INTEGER DEFAULT 1000)
+RETURNS INTEGER AS $$
+DECLARE
+    rebuilt INTEGER;
+BEGIN
+    -- search_vector and search_hash aren't trigger columns, so this doesn't fire it
+    UPDATE content
+    SET search_vector = content_search_vector(content),
+        search_hash = content_search_hash(content)
+    WHERE id IN (
+        SELECT id FROM content
+        WHERE search_hash IS NULL
+        LIMIT batch_size
+    );
+
+    GET DIAGNOSTICS rebuilt = ROW_COUNT;
+    RETURN rebuilt;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Rows indexed before this migration get the hash of their current text;
+-- rows without a vector are left for rebuild_search_vectors()
+UPDATE content SET search_hash = content_search_hash(content) WHERE search_vector IS NOT NULL;
@@ -0,0 +1,35 @@
+-- Numeric chapter order. chapter_number is free text ("10.5", "Extra"),
+-- so importers store a sort_key (scraper/chapter_order.py) and readers
+-- page through (content_id, sort_key, id) with keyset pagination.
+ALTER TABLE chapters ADD COLUMN IF NOT EXISTS sort_key NUMERIC;
+CREATE INDEX IF NOT EXISTS chapters_content_sort_idx ON chapters(content_id, sort_key, id);
+
+-- The number in a chapter label, ignoring volume prefixes ("Vol. 2 Ch. 15" -> 15)
+CREATE OR REPLACE FUNCTION chapter_number_value(chapter_number TEXT)
+RETURNS NUMERIC AS $$
+    SELECT (regexp_match(
+        regexp_replace(chapter_number, '\mvol(?:ume)?\.?\s*\d+(?:\.\d+)?', ' ', 'gi'),
+        '(\d+(?:\.\d+)?)'
+    ))[1]::NUMERIC;
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Backfill with the importers' rules: numbered chapters by their number,
+-- unnumbered ones 0.001 apart after the highest number stored before them
+WITH valued AS (
+    SELECT id, content_id, created_at, chapter_number_value(chapter_number) AS value
+    FROM chapters
+    WHERE sort_key IS NULL
+), anchored AS (
+    SELECT valued.*, COALESCE(MAX(value) OVER (PARTITION BY content_id ORDER BY created_at, id), -1) AS anchor
+    FROM valued
+), keyed AS (
+    SELECT id, COALESCE(
+        value,
+        anchor + 0.001 * ROW_NUMBER() OVER (PARTITION BY content_id, anchor, value IS NULL ORDER BY created_at, id)
+    ) AS sort_key
+    FROM anchored
+)
+UPDATE chapters
+SET sort_key = keyed.sort_key
+FROM keyed
+WHERE chapters.id = keyed.id;
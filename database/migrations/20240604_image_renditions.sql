@@ -0,0 +1,25 @@
+-- Resized WebP/AVIF renditions of mirrored covers and chapter pages,
+-- written by scraper/render_images.py. Covers also carry theirs on
+-- content.cover_renditions so listings get them without another query.
+ALTER TABLE content ADD COLUMN IF NOT EXISTS cover_renditions JSONB;
+
+CREATE TABLE IF NOT EXISTS image_renditions (
+    source_url TEXT NOT NULL,
+    format TEXT NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    bytes INTEGER NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (source_url, format, width)
+);
+
+ALTER TABLE image_renditions ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Allow public read access on image_renditions" ON image_renditions;
+CREATE POLICY "Allow public read access on image_renditions" ON image_renditions
+    FOR SELECT USING (true);
+
+DROP POLICY IF EXISTS "Allow service role full access on image_renditions" ON image_renditions;
+CREATE POLICY "Allow service role full access on image_renditions" ON image_renditions
+    FOR ALL USING (auth.role() = 'service_role');
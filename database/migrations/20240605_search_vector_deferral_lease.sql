@@ -0,0 +1,72 @@
+-- Search vector deferral expires on its own. A boolean flag was only
+-- cleared by the bulk import that set it, so a killed import left every
+-- later content write unindexed. Bulk imports now hold the deferral as a
+-- lease (deferred_until) that they keep renewing, and once it runs out
+-- the trigger indexes rows again. rebuild_search_vectors() does nothing
+-- while a deferral is held, so other crawls can call it at startup to
+-- catch up rows a killed import left stale.
+ALTER TABLE search_vector_settings ADD COLUMN IF NOT EXISTS deferred_until TIMESTAMP WITH TIME ZONE;
+ALTER TABLE search_vector_settings DROP COLUMN IF EXISTS deferred;
+
+CREATE OR REPLACE FUNCTION search_vectors_deferred()
+RETURNS BOOLEAN AS $$
+    SELECT COALESCE((SELECT deferred_until > now() FROM search_vector_settings), false);
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION update_search_vector()
+RETURNS TRIGGER AS $$
+DECLARE
+    text_hash TEXT;
+BEGIN
+    text_hash := content_search_hash(NEW);
+    IF NEW.search_hash IS NOT DISTINCT FROM text_hash THEN
+        RETURN NEW;
+    END IF;
+
+    IF search_vectors_deferred() THEN
+        -- Left for rebuild_search_vectors()
+        NEW.search_hash := NULL;
+    ELSE
+        NEW.search_vector := content_search_vector(NEW);
+        NEW.search_hash := text_hash;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP FUNCTION IF EXISTS set_search_vector_deferred(BOOLEAN);
+
+-- Defer indexing for the next `seconds` (renew before it runs out), or resume it with 0
+CREATE OR REPLACE FUNCTION set_search_vector_deferred(seconds INTEGER)
+RETURNS TIMESTAMP WITH TIME ZONE AS $$
+    UPDATE search_vector_settings
+    SET deferred_until = CASE WHEN seconds > 0 THEN now() + make_interval(secs => seconds) END
+    WHERE id
+    RETURNING deferred_until;
+$$ LANGUAGE sql;
+
+-- Rebuild up to batch_size stale search vectors; call until it returns 0.
+-- Returns 0 right away while indexing is deferred.
+CREATE OR REPLACE FUNCTION rebuild_search_vectors(batch_size INTEGER DEFAULT 1000)
+RETURNS INTEGER AS $$
+DECLARE
+    rebuilt INTEGER;
+BEGIN
+    IF search_vectors_deferred() THEN
+        RETURN 0;
+    END IF;
+
+    -- search_vector and search_hash aren't trigger columns, so this doesn't fire it
+    UPDATE content
+    SET search_vector = content_search_vector(content),
+        search_hash = content_search_hash(content)
+    WHERE id IN (
+        SELECT id FROM content
+        WHERE search_hash IS NULL
+        LIMIT batch_size
+    );
+
+    GET DIAGNOSTICS rebuilt = ROW_COUNT;
+    RETURN rebuilt;
+END;
+$$ LANGUAGE plpgsql;
@@ -1,7 +1,13 @@
 -- Drop functions and triggers first (if they exist)
 DROP FUNCTION IF EXISTS update_content_total_chapters() CASCADE;
+DROP FUNCTION IF EXISTS recount_content_chapters(UUID[]) CASCADE;
 DROP FUNCTION IF EXISTS update_updated_at() CASCADE;
 DROP FUNCTION IF EXISTS update_search_vector() CASCADE;
+DROP FUNCTION IF EXISTS set_search_vector_deferred(BOOLEAN) CASCADE;
+DROP FUNCTION IF EXISTS set_search_vector_deferred(INTEGER) CASCADE;
+DROP FUNCTION IF EXISTS search_vectors_deferred() CASCADE;
+DROP FUNCTION IF EXISTS rebuild_search_vectors(INTEGER) CASCADE;
+DROP FUNCTION IF EXISTS chapter_number_value(TEXT) CASCADE;
 
 -- Drop tables in correct order (dependent tables first)
 DROP TABLE IF EXISTS likes CASCADE;
@@ -10,6 +16,8 @@ DROP TABLE IF EXISTS bookmarks CASCADE;
 DROP TABLE IF EXISTS reading_progress CASCADE;
 DROP TABLE IF EXISTS chapters CASCADE;
 DROP TABLE IF EXISTS content CASCADE;
+DROP TABLE IF EXISTS search_vector_settings CASCADE;
+DROP TABLE IF EXISTS image_renditions CASCADE;
 
 -- Drop types
 DROP TYPE IF EXISTS content_rating CASCADE;
@@ -52,7 +60,9 @@ CREATE TABLE content (
     likes INTEGER DEFAULT 0,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
-    search_vector tsvector
+    search_vector tsvector,
+    search_hash TEXT,
+    cover_renditions JSONB
 );
 
 -- Create chapters table
@@ -66,10 +76,23 @@ CREATE TABLE chapters (
     language TEXT DEFAULT 'en',
     scanlation_group TEXT,
     publish_at TIMESTAMP WITH TIME ZONE,
+    sort_key NUMERIC,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Resized WebP/AVIF renditions of mirrored images (scraper/render_images.py)
+CREATE TABLE image_renditions (
+    source_url TEXT NOT NULL,
+    format TEXT NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    bytes INTEGER NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (source_url, format, width)
+);
+
 -- Create user preferences tables
 CREATE TABLE favorites (
     id UUID DEFAULT uuid_generate_v4() PRIMARY KEY,
@@ -107,12 +130,24 @@ CREATE TABLE reading_progress (
 
 -- Create indexes
 CREATE INDEX content_search_idx ON content USING GIN(search_vector);
+CREATE INDEX content_search_stale_idx ON content(id) WHERE search_hash IS NULL;
 CREATE INDEX content_title_idx ON content USING GIN(to_tsvector('english', title));
 CREATE INDEX content_genres_idx ON content USING GIN(genres);
 CREATE INDEX content_tags_idx ON content USING GIN(tags);
 CREATE INDEX chapters_content_id_idx ON chapters(content_id);
+CREATE INDEX chapters_content_sort_idx ON chapters(content_id, sort_key, id);
 CREATE INDEX reading_progress_user_content_idx ON reading_progress(user_id, content_id);
 
+-- The number in a chapter label, ignoring volume prefixes ("Vol. 2 Ch. 15" -> 15);
+-- importers compute sort_key with the same rules (scraper/chapter_order.py)
+CREATE OR REPLACE FUNCTION chapter_number_value(chapter_number TEXT)
+RETURNS NUMERIC AS $$
+    SELECT (regexp_match(
+        regexp_replace(chapter_number, '\mvol(?:ume)?\.?\s*\d+(?:\.\d+)?', ' ', 'gi'),
+        '(\d+(?:\.\d+)?)'
+    ))[1]::NUMERIC;
+$$ LANGUAGE sql IMMUTABLE;
+
 -- Create update trigger for updated_at
 CREATE OR REPLACE FUNCTION update_updated_at()
 RETURNS TRIGGER AS $$
@@ -132,30 +167,100 @@ CREATE TRIGGER chapters_updated_at
     FOR EACH ROW
     EXECUTE FUNCTION update_updated_at();
 
--- Create function to update search vector
+-- Search vectors are only rebuilt when the text they're built from changes
+-- (tracked by search_hash), and can be deferred during bulk imports. The
+-- deferral is a lease the import keeps renewing, so a killed import can't
+-- leave it on.
+CREATE TABLE search_vector_settings (
+    id BOOLEAN PRIMARY KEY DEFAULT true CHECK (id),
+    deferred_until TIMESTAMP WITH TIME ZONE
+);
+INSERT INTO search_vector_settings (id) VALUES (true);
+-- Only the service role (which bypasses RLS) sees the setting
+ALTER TABLE search_vector_settings ENABLE ROW LEVEL SECURITY;
+
+CREATE OR REPLACE FUNCTION content_search_hash(row_data content)
+RETURNS TEXT AS $$
+    SELECT md5(concat_ws(E'\x1f',
+        row_data.title,
+        row_data.description,
+        array_to_string(row_data.tags, ' '),
+        array_to_string(row_data.genres, ' '),
+        array_to_string(row_data.authors, ' '),
+        array_to_string(row_data.artists, ' ')
+    ));
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION content_search_vector(row_data content)
+RETURNS tsvector AS $$
+    SELECT setweight(to_tsvector('english', COALESCE(row_data.title, '')), 'A')
+        || setweight(to_tsvector('english', COALESCE(row_data.description, '')), 'B')
+        || setweight(to_tsvector('english', COALESCE(array_to_string(row_data.tags, ' '), '')), 'C')
+        || setweight(to_tsvector('english', COALESCE(array_to_string(row_data.genres, ' '), '')), 'C')
+        || setweight(to_tsvector('english', COALESCE(array_to_string(row_data.authors, ' '), '')), 'B')
+        || setweight(to_tsvector('english', COALESCE(array_to_string(row_data.artists, ' '), '')), 'B');
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION search_vectors_deferred()
+RETURNS BOOLEAN AS $$
+    SELECT COALESCE((SELECT deferred_until > now() FROM search_vector_settings), false);
+$$ LANGUAGE sql STABLE;
+
 CREATE OR REPLACE FUNCTION update_search_vector()
 RETURNS TRIGGER AS $$
 DECLARE
-    title_vector tsvector;
-    desc_vector tsvector;
-    tags_vector tsvector;
-    genres_vector tsvector;
-    authors_vector tsvector;
-    artists_vector tsvector;
+    text_hash TEXT;
 BEGIN
-    -- Create individual vectors with proper weights
-    title_vector := setweight(to_tsvector('english', COALESCE(NEW.title, '')), 'A');
-    desc_vector := setweight(to_tsvector('english', COALESCE(NEW.description, '')), 'B');
-    tags_vector := setweight(to_tsvector('english', COALESCE(array_to_string(NEW.tags, ' '), '')), 'C');
-    genres_vector := setweight(to_tsvector('english', COALESCE(array_to_string(NEW.genres, ' '), '')), 'C');
-    authors_vector := setweight(to_tsvector('english', COALESCE(array_to_string(NEW.authors, ' '), '')), 'B');
-    artists_vector := setweight(to_tsvector('english', COALESCE(array_to_string(NEW.artists, ' '), '')), 'B');
-
-    -- Combine all vectors
-    NEW.search_vector := title_vector || desc_vector || tags_vector || genres_vector || authors_vector || artists_vector;
+    text_hash := content_search_hash(NEW);
+    IF NEW.search_hash IS NOT DISTINCT FROM text_hash THEN
+        RETURN NEW;
+    END IF;
+
+    IF search_vectors_deferred() THEN
+        -- Left for rebuild_search_vectors()
+        NEW.search_hash := NULL;
+    ELSE
+        NEW.search_vector := content_search_vector(NEW);
+        NEW.search_hash := text_hash;
+    END IF;
     RETURN NEW;
 END;
-$$ LANGUAGE plpgsql IMMUTABLE;
+$$ LANGUAGE plpgsql;
+
+-- Defer indexing for the next `seconds` (renew before it runs out), or resume it with 0
+CREATE OR REPLACE FUNCTION set_search_vector_deferred(seconds INTEGER)
+RETURNS TIMESTAMP WITH TIME ZONE AS $$
+    UPDATE search_vector_settings
+    SET deferred_until = CASE WHEN seconds > 0 THEN now() + make_interval(secs => seconds) END
+    WHERE id
+    RETURNING deferred_until;
+$$ LANGUAGE sql;
+
+-- Rebuild up to batch_size stale search vectors; call until it returns 0.
+-- Returns 0 right away while indexing is deferred.
+CREATE OR REPLACE FUNCTION rebuild_search_vectors(batch_size INTEGER DEFAULT 1000)
+RETURNS INTEGER AS $$
+DECLARE
+    rebuilt INTEGER;
+BEGIN
+    IF search_vectors_deferred() THEN
+        RETURN 0;
+    END IF;
+
+    -- search_vector and search_hash aren't trigger columns, so this doesn't fire it
+    UPDATE content
+    SET search_vector = content_search_vector(content),
+        search_hash = content_search_hash(content)
+    WHERE id IN (
+        SELECT id FROM content
+        WHERE search_hash IS NULL
+        LIMIT batch_size
+    );
+
+    GET DIAGNOSTICS rebuilt = ROW_COUNT;
+    RETURN rebuilt;
+END;
+$$ LANGUAGE plpgsql;
 
 -- Create trigger for search vector updates
 CREATE TRIGGER update_content_search_vector
@@ -174,40 +279,99 @@ CREATE INDEX content_views_idx ON content(views DESC);
 CREATE INDEX content_likes_idx ON content(likes DESC);
 CREATE INDEX content_last_chapter_idx ON content(last_chapter_update DESC);
 
--- Create function to update total chapters count
+-- Maintain total chapters per statement: one +n/-n delta per title,
+-- read from the statement's transition table
 CREATE OR REPLACE FUNCTION update_content_total_chapters()
 RETURNS TRIGGER AS $$
 BEGIN
-    IF TG_OP = 'INSERT' OR TG_OP = 'UPDATE' THEN
+    IF TG_OP = 'INSERT' THEN
         UPDATE content
-        SET total_chapters = (
-            SELECT COUNT(*)
-            FROM chapters
-            WHERE content_id = NEW.content_id
-        )
-        WHERE id = NEW.content_id;
+        SET total_chapters = COALESCE(content.total_chapters, 0) + delta.chapters
+        FROM (
+            SELECT content_id, COUNT(*) AS chapters
+            FROM new_chapters
+            WHERE content_id IS NOT NULL
+            GROUP BY content_id
+        ) delta
+        WHERE content.id = delta.content_id;
     ELSIF TG_OP = 'DELETE' THEN
-        UPDATE content 
-        SET total_chapters = (
-            SELECT COUNT(*) 
-            FROM chapters 
-            WHERE content_id = OLD.content_id
-        )
-        WHERE id = OLD.content_id;
+        UPDATE content
+        SET total_chapters = GREATEST(COALESCE(content.total_chapters, 0) - delta.chapters, 0)
+        FROM (
+            SELECT content_id, COUNT(*) AS chapters
+            FROM old_chapters
+            WHERE content_id IS NOT NULL
+            GROUP BY content_id
+        ) delta
+        WHERE content.id = delta.content_id;
+    ELSIF TG_OP = 'UPDATE' THEN
+        -- Only chapters moved to another title change any count
+        UPDATE content
+        SET total_chapters = GREATEST(COALESCE(content.total_chapters, 0) + delta.chapters, 0)
+        FROM (
+            SELECT content_id, SUM(change) AS chapters
+            FROM (
+                SELECT content_id, 1 AS change FROM new_chapters
+                UNION ALL
+                SELECT content_id, -1 AS change FROM old_chapters
+            ) moved
+            WHERE content_id IS NOT NULL
+            GROUP BY content_id
+            HAVING SUM(change) <> 0
+        ) delta
+        WHERE content.id = delta.content_id;
     END IF;
     RETURN NULL;
 END;
 $$ LANGUAGE plpgsql;
 
--- Create trigger to update total chapters
-CREATE TRIGGER update_content_chapters_count
-    AFTER INSERT OR UPDATE OR DELETE ON chapters
-    FOR EACH ROW
+-- Transition tables need one trigger per event
+CREATE TRIGGER content_chapters_count_insert
+    AFTER INSERT ON chapters
+    REFERENCING NEW TABLE AS new_chapters
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION update_content_total_chapters();
+
+CREATE TRIGGER content_chapters_count_update
+    AFTER UPDATE ON chapters
+    REFERENCING OLD TABLE AS old_chapters NEW TABLE AS new_chapters
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION update_content_total_chapters();
+
+CREATE TRIGGER content_chapters_count_delete
+    AFTER DELETE ON chapters
+    REFERENCING OLD TABLE AS old_chapters
+    FOR EACH STATEMENT
     EXECUTE FUNCTION update_content_total_chapters();
 
+-- Recount total chapters from scratch, for all titles or the given ones.
+-- Returns the number of titles whose count was wrong.
+CREATE OR REPLACE FUNCTION recount_content_chapters(content_ids UUID[] DEFAULT NULL)
+RETURNS INTEGER AS $$
+DECLARE
+    fixed INTEGER;
+BEGIN
+    UPDATE content
+    SET total_chapters = counts.chapters
+    FROM (
+        SELECT content.id, COUNT(chapters.id) AS chapters
+        FROM content
+        LEFT JOIN chapters ON chapters.content_id = content.id
+        WHERE content_ids IS NULL OR content.id = ANY(content_ids)
+        GROUP BY content.id
+    ) counts
+    WHERE content.id = counts.id
+    AND content.total_chapters IS DISTINCT FROM counts.chapters;
+
+    GET DIAGNOSTICS fixed = ROW_COUNT;
+    RETURN fixed;
+END;
+$$ LANGUAGE plpgsql;
+
 -- Create RLS policies
 ALTER TABLE content ENABLE ROW LEVEL SECURITY;
 ALTER TABLE chapters ENABLE ROW LEVEL SECURITY;
+ALTER TABLE image_renditions ENABLE ROW LEVEL SECURITY;
 
 -- Allow public read access
 CREATE POLICY "Allow public read access on content" ON content
@@ -216,6 +380,9 @@ CREATE POLICY "Allow public read access on content" ON content
 CREATE POLICY "Allow public read access on chapters" ON chapters
     FOR SELECT USING (true);
 
+CREATE POLICY "Allow public read access on image_renditions" ON image_renditions
+    FOR SELECT USING (true);
+
 -- Allow service role full access
 CREATE POLICY "Allow service role full access on content" ON content
     FOR ALL USING (auth.role() = 'service_role');
@@ -223,6 +390,9 @@ CREATE POLICY "Allow service role full access on content" ON content
 CREATE POLICY "Allow service role full access on chapters" ON chapters
     FOR ALL USING (auth.role() = 'service_role');
 
+CREATE POLICY "Allow service role full access on image_renditions" ON image_renditions
+    FOR ALL USING (auth.role() = 'service_role');
+
 -- Allow public read access to safe content
 CREATE POLICY "Public can view safe content" ON content
     FOR SELECT
@@ -1,13 +1,38 @@
 import os
 import json
 import asyncio
+import argparse
+import functools
 import logging
-from typing import Optional, List, Dict, Any
-from datetime import datetime
+import re
+import socket
+import sys
+import time
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Dict, Any, Awaitable, Callable, Tuple, Set, Union
+from datetime import datetime, timedelta, timezone
 
 import aiohttp
 from dotenv import load_dotenv
 from supabase import create_client, Client
+from postgrest.types import ReturnMethod
+
+# The scraper/ modules import each other by their plain names, so they are
+# imported the same way here and each is only ever loaded once
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scraper'))
+
+from chapter_order import sort_keys
+from crawl_leases import SHARD_TIME_FORMAT, CrawlLeases, shard_ranges
+from http_cache import ResponseCache
+from metrics import metrics
+from rate_limiter import RateLimiter
+
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:  # optional, the standard library decoder is just slower
+    json_loads = json.loads
 
 # Configure logging
 logging.basicConfig(
@@ -17,25 +42,278 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+UUID_PATTERN = re.compile(r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}')
+
+# Largest page size accepted by the /manga/{id}/feed endpoint
+CHAPTER_FEED_PAGE_SIZE = 500
+
+# MangaDex rejects list requests whose offset + limit goes past this
+MAX_LIST_WINDOW = 10000
+
+def supabase_client() -> Client:
+    """Supabase client with the service role key from .env.local"""
+    load_dotenv('.env.local')
+
+    supabase_url = os.getenv('NEXT_PUBLIC_SUPABASE_URL')
+    supabase_key = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
+
+    if not supabase_url or not supabase_key:
+        raise ValueError("Missing Supabase credentials")
+
+    return create_client(supabase_url, supabase_key)
+
+
+def set_search_vector_deferred(supabase: Client, seconds: int):
+    """Leave content search vectors for a rebuild for the next `seconds`, or resume indexing with 0
+
+    The deferral runs out on its own, so a bulk import that is killed
+    can't leave it on; keep_search_vectors_deferred renews it meanwhile.
+    """
+    supabase.rpc('set_search_vector_deferred', {'seconds': seconds}).execute()
+
+
+async def keep_search_vectors_deferred(supabase: Client, seconds: int):
+    """Renew the search vector deferral until cancelled"""
+    while True:
+        await asyncio.sleep(seconds / 3)
+        try:
+            await asyncio.to_thread(set_search_vector_deferred, supabase, seconds)
+        except Exception as e:
+            logger.warning(f"Error renewing the search vector deferral: {e}")
+
+
+def rebuild_search_vectors(supabase: Client, batch_size: int = 1000) -> int:
+    """Index the content rows left stale while search vectors were deferred, a batch per call
+
+    Nothing is rebuilt while another import holds the deferral.
+    """
+    total = 0
+    while True:
+        rebuilt = supabase.rpc('rebuild_search_vectors', {'batch_size': batch_size}).execute().data or 0
+        total += rebuilt
+        if rebuilt < batch_size:
+            break
+    logger.info(f"Rebuilt {total} search vectors")
+    return total
+
+
+class Record:
+    """Compact row built straight from an API payload, turned into a dict only when written"""
+    __slots__ = ()
+
+    def __init__(self, **fields: Any):
+        for name in self.__slots__:
+            setattr(self, name, fields.get(name))
+
+    def to_row(self, updated_at: str) -> Dict[str, Any]:
+        """Upsert payload; created_at is left to the database so re-crawls don't reset it"""
+        row = {name: getattr(self, name) for name in self.__slots__}
+        row['updated_at'] = updated_at
+        return row
+
+
+class MangaRecord(Record):
+    __slots__ = (
+        'title', 'description', 'cover_image', 'genres', 'tags', 'authors', 'artists', 'status',
+        'content_rating', 'rating', 'content_type', 'source_url', 'last_chapter_update',
+    )
+
+
+class ChapterRecord(Record):
+    __slots__ = ('chapter_number', 'sort_key', 'title', 'source_url', 'language', 'scanlation_group', 'publish_at', 'content_id')
+
+
+class MangaListEntry:
+    """What the crawl keeps of a manga list entry while it waits in the fetch queue"""
+    __slots__ = ('id', 'source_url', 'last_chapter_update', 'created_at', 'record')
+
+    def __init__(
+        self,
+        manga_id: str,
+        source_url: str,
+        last_chapter_update: Optional[datetime],
+        created_at: Optional[str],
+        record: Optional[MangaRecord],
+    ):
+        self.id = manga_id
+        self.source_url = source_url
+        self.last_chapter_update = last_chapter_update
+        self.created_at = created_at
+        self.record = record
+
+
+class ShardCursor:
+    """List positions of a shard's pages that aren't fully stored yet, for lease renewals"""
+    __slots__ = ('positions', 'next_position')
+
+    def __init__(self, position: Tuple[str, int]):
+        # page number -> list position
+        self.positions: Dict[int, Tuple[str, int]] = {}
+        self.next_position = position
+
+    def current(self, first_pending_page: int) -> Tuple[str, int]:
+        """Position to resume from: the first page not fully stored, or the next page to list"""
+        for done in [page for page in self.positions if page < first_pending_page]:
+            del self.positions[done]
+        return self.positions.get(first_pending_page, self.next_position)
+
+
+class CrawlCheckpoint:
+    def __init__(self, path: Optional[str]):
+        """Progress of a crawl, saved atomically so an interrupted crawl can resume
+
+        offset is the first list page that hasn't been fully processed.
+        Manga already finished on pages at or after it are kept in completed
+        (source_url -> chapters stored) so a resumed crawl skips them.
+        unsynced_before is the earliest last_chapter_update of titles whose
+        chapters weren't all stored, which the sync watermark stays below.
+        Without a path progress is only tracked in memory.
+        """
+        self.path = path
+        self.offset = 0
+        self.next_offset = 0
+        self.last_manga_id: Optional[str] = None
+        self.latest_update_seen: Optional[str] = None
+        self.unsynced_before: Optional[str] = None
+        self.completed: Dict[str, int] = {}
+        self.pending: Dict[int, Set[str]] = {}
+        self.page_of: Dict[str, Set[int]] = {}
+
+    def load(self) -> bool:
+        """Load a previous checkpoint, returning False when there is none"""
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return False
+
+        self.offset = self.next_offset = state.get('offset', 0)
+        self.last_manga_id = state.get('last_manga_id')
+        self.latest_update_seen = state.get('latest_update_seen')
+        self.unsynced_before = state.get('unsynced_before')
+        self.completed = state.get('completed', {})
+        return True
+
+    def save(self):
+        """Write the checkpoint to a temp file and rename it over the old one"""
+        if not self.path:
+            return
+        state = {
+            'offset': self.offset,
+            'last_manga_id': self.last_manga_id,
+            'latest_update_seen': self.latest_update_seen,
+            'unsynced_before': self.unsynced_before,
+            'completed': self.completed,
+            'saved_at': datetime.now().isoformat()
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        """Remove the checkpoint once a crawl has finished"""
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def add_page(self, offset: int, limit: int, source_urls: List[str]):
+        """Register the manga of a list page, leaving out those already completed
+
+        A title can be listed again on a later page when uploads reorder the
+        list mid-crawl, so each title keeps the set of pages it is on.
+        """
+        self.pending[offset] = {url for url in source_urls if url not in self.completed}
+        for source_url in source_urls:
+            self.page_of.setdefault(source_url, set()).add(offset)
+        self.next_offset = offset + limit
+        self.advance()
+
+    def complete(self, source_url: str, chapters: int = 0):
+        """Mark a manga as done and move the offset past finished pages"""
+        for offset in self.page_of.get(source_url, ()):
+            pending = self.pending.get(offset)
+            if pending is not None:
+                pending.discard(source_url)
+        self.completed[source_url] = chapters
+        self.last_manga_id = source_url.rsplit('/', 1)[-1]
+        self.advance()
+
+    def advance(self):
+        """Move the offset to the first page that still has unfinished manga"""
+        while self.pending and not self.pending[min(self.pending)]:
+            del self.pending[min(self.pending)]
+        previous = self.offset
+        self.offset = min(self.pending) if self.pending else self.next_offset
+        if self.offset == previous:
+            return
+
+        # Titles only listed on pages before the offset will never be revisited
+        finished = [url for url, offsets in self.page_of.items() if max(offsets) < self.offset]
+        for source_url in finished:
+            del self.page_of[source_url]
+            self.completed.pop(source_url, None)
+
 class MangaDexScraper:
-    def __init__(self):
-        """Initialize the scraper with Supabase client"""
-        load_dotenv('.env.local')
-        
-        supabase_url = os.getenv('NEXT_PUBLIC_SUPABASE_URL')
-        supabase_key = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
-        
-        if not supabase_url or not supabase_key:
-            raise ValueError("Missing Supabase credentials")
-            
-        self.supabase: Client = create_client(supabase_url, supabase_key)
+    def __init__(
+        self,
+        max_workers: int = 4,
+        requests_per_second: float = 5.0,
+        queue_size: int = 200,
+        max_retries: int = 5,
+        write_batch_size: int = 50,
+        incremental: bool = False,
+        sync_state_path: str = '.mangadex_sync.json',
+        db_workers: int = 2,
+        write_coalesce: int = 20,
+        checkpoint_path: str = '.mangadex_checkpoint.json',
+        cache: Optional[ResponseCache] = None,
+    ):
+        """Initialize the scraper with Supabase client
+
+        max_workers controls how many manga are fetched concurrently and
+        requests_per_second is the token bucket rate shared by all of them.
+        write_batch_size is the number of rows sent per upsert request.
+        In incremental mode the crawl stops at the last_chapter_update
+        watermark saved in sync_state_path by the previous complete crawl.
+        Supabase calls run on a pool of db_workers threads, with up to
+        write_coalesce fetched manga combined into one write. Progress is
+        checkpointed to checkpoint_path so scrape_all_manga(resume=True) can
+        pick up an interrupted crawl. An optional ResponseCache serves and
+        revalidates API responses from disk.
+        """
+        self.supabase: Client = supabase_client()
         self.base_url = "https://api.mangadex.org"
         self.session: Optional[aiohttp.ClientSession] = None
 
+        self.max_workers = max(1, max_workers)
+        self.queue_size = queue_size
+        self.max_retries = max_retries
+        self.write_batch_size = max(1, write_batch_size)
+        self.db_workers = max(1, db_workers)
+        self.write_coalesce = max(1, write_coalesce)
+        self.db_executor: Optional[ThreadPoolExecutor] = None
+        self.checkpoint = CrawlCheckpoint(checkpoint_path)
+        self.cache = cache
+        self.incremental = incremental
+        self.sync_state_path = sync_state_path
+        self.watermark: Optional[datetime] = None
+        self.latest_update_seen: Optional[datetime] = None
+        # last_chapter_update of titles whose chapters weren't all stored this crawl
+        self.unsynced_updates: List[datetime] = []
+        self.rate_limiter = RateLimiter(rate=requests_per_second)
+        self.total_processed = 0
+        self.detail_calls_avoided = 0
+        # source_url -> content id / last_chapter_update for titles already stored in Supabase
+        self.content_ids: Dict[str, str] = {}
+        self.stored_chapter_updates: Dict[str, Optional[datetime]] = {}
+        self.unchanged_skipped = 0
+
     async def __aenter__(self):
         """Create aiohttp session"""
         if not self.session:
             self.session = aiohttp.ClientSession()
+        if not self.db_executor:
+            self.db_executor = ThreadPoolExecutor(max_workers=self.db_workers, thread_name_prefix='supabase-writer')
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
@@ -43,30 +321,97 @@ class MangaDexScraper:
         if self.session:
             await self.session.close()
             self.session = None
+        if self.db_executor:
+            self.db_executor.shutdown(wait=True)
+            self.db_executor = None
 
-    async def fetch_manga_list(self, offset: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
-        """Fetch a list of manga from MangaDex"""
+    async def get_json(self, url: str, params: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """GET a MangaDex endpoint through the cache and rate limiter, retrying on 429"""
         if not self.session:
             raise RuntimeError("Session not initialized. Use async with context.")
-            
+
+        endpoint = UUID_PATTERN.sub('{id}', url[len(self.base_url):])
+
+        cached = self.cache.lookup(url, params) if self.cache else None
+        if cached and cached['fresh']:
+            return json_loads(cached['body'])
+        if self.cache and self.cache.offline:
+            logger.error(f"No cached response for {url} in offline mode")
+            return None
+        conditional_headers = ResponseCache.conditional_headers(cached)
+
+        for attempt in range(self.max_retries):
+            await self.rate_limiter.acquire(url)
+            if attempt > 0:
+                metrics.inc('scraper_retries_total', scraper='mangadex', endpoint=endpoint)
+
+            start = time.perf_counter()
+            async with self.session.get(url, params=params, headers=conditional_headers) as response:
+                body = await response.read()
+                metrics.observe('scraper_request_seconds', time.perf_counter() - start, scraper='mangadex', endpoint=endpoint)
+                metrics.inc('scraper_requests_total', scraper='mangadex', endpoint=endpoint, status=str(response.status))
+                metrics.inc('scraper_bytes_downloaded_total', len(body), scraper='mangadex', endpoint=endpoint)
+
+                retry_delay = self.rate_limiter.update_from_response(url, response.status, response.headers, attempt)
+                if retry_delay is not None:
+                    metrics.inc('scraper_rate_limited_total', scraper='mangadex', endpoint=endpoint)
+                    continue
+                if response.status == 304 and cached:
+                    self.cache.refresh(cached)
+                    return json_loads(cached['body'])
+                if response.status == 200:
+                    if self.cache:
+                        self.cache.store(url, params, response.status, response.headers, body)
+                    return json_loads(body)
+                logger.error(f"Request to {url} failed: {response.status}")
+                return None
+
+        logger.error(f"Giving up on {url} after {self.max_retries} rate limited attempts")
+        return None
+
+    @staticmethod
+    def manga_list_params(
+        offset: int = 0,
+        limit: int = 100,
+        created_since: Optional[str] = None,
+        order: Tuple[str, str] = ('latestUploadedChapter', 'desc'),
+    ) -> Dict[str, Any]:
+        """Query parameters of a manga list page request"""
         params = {
             'limit': limit,
             'offset': offset,
             'contentRating[]': ['safe', 'suggestive'],
             'hasAvailableChapters': 'true',
-            'order[latestUploadedChapter]': 'desc',
+            f'order[{order[0]}]': order[1],
             'includes[]': ['author', 'artist', 'cover_art']
         }
-        
-        async with self.session.get(f"{self.base_url}/manga", params=params) as response:
-            if response.status == 200:
-                data = await response.json()
-                return data.get('data', [])
-            else:
-                logger.error(f"Failed to fetch manga list: {response.status}")
-                return []
+        if created_since:
+            params['createdAtSince'] = created_since
+        return params
 
-    async def fetch_manga_details(self, manga_id: str) -> Optional[Dict[str, Any]]:
+    async def fetch_manga_page(
+        self,
+        offset: int = 0,
+        limit: int = 100,
+        created_since: Optional[str] = None,
+        order: Tuple[str, str] = ('latestUploadedChapter', 'desc'),
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Fetch a page of the manga list, or None if the request failed"""
+        if not self.session:
+            raise RuntimeError("Session not initialized. Use async with context.")
+
+        params = self.manga_list_params(offset, limit, created_since, order)
+        data = await self.get_json(f"{self.base_url}/manga", params)
+        if data is None:
+            logger.error(f"Failed to fetch manga list at offset {offset}")
+            return None
+        return data.get('data', [])
+
+    async def fetch_manga_list(self, offset: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
+        """Fetch a list of manga from MangaDex"""
+        return await self.fetch_manga_page(offset, limit) or []
+
+    async def fetch_manga_details(self, manga_id: str) -> Optional[MangaRecord]:
         """Fetch detailed information about a manga"""
         if not self.session:
             raise RuntimeError("Session not initialized. Use async with context.")
@@ -74,15 +419,78 @@ class MangaDexScraper:
         params = {
             'includes[]': ['author', 'artist', 'cover_art']
         }
-        async with self.session.get(f"{self.base_url}/manga/{manga_id}", params=params) as response:
-            if response.status == 200:
-                data = await response.json()
-                return self.process_manga_data(data['data'])
-            else:
-                logger.error(f"Failed to fetch manga {manga_id}: {response.status}")
-                return None
+        data = await self.get_json(f"{self.base_url}/manga/{manga_id}", params)
+        if data is None:
+            logger.error(f"Failed to fetch manga {manga_id}")
+            return None
+        return self.process_manga_data(data['data'])
+
+    @staticmethod
+    def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+        """Parse an ISO 8601 timestamp from MangaDex or Supabase"""
+        if not value:
+            return None
+        try:
+            return datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+
+    def load_watermark(self) -> Optional[datetime]:
+        """Read the last_chapter_update reached by the previous complete crawl"""
+        try:
+            with open(self.sync_state_path) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable sync state {self.sync_state_path}: {e}")
+            return None
+        return self.parse_timestamp(state.get('last_chapter_update'))
+
+    def save_watermark(self):
+        """Persist the newest last_chapter_update seen during this crawl
+
+        The watermark is kept just below any title whose chapters weren't
+        all stored, so the next incremental crawl reaches it again.
+        """
+        watermark = self.latest_update_seen
+        if not watermark:
+            return
+        if self.unsynced_updates:
+            watermark = min(watermark, min(self.unsynced_updates) - timedelta(microseconds=1))
+
+        tmp_path = f"{self.sync_state_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'last_chapter_update': watermark.isoformat()}, f)
+        os.replace(tmp_path, self.sync_state_path)
+        logger.info(f"Saved sync watermark {watermark.isoformat()}")
+
+    def hold_watermark(self, last_chapter_update: Union[str, datetime, None]):
+        """Keep the watermark below a title that wasn't fully synced"""
+        if isinstance(last_chapter_update, str):
+            last_chapter_update = self.parse_timestamp(last_chapter_update)
+        if last_chapter_update:
+            self.unsynced_updates.append(last_chapter_update)
 
-    def process_manga_data(self, manga_data: Dict[str, Any]) -> Dict[str, Any]:
+    @staticmethod
+    def manga_source_url(manga_id: str) -> str:
+        """Source URL stored in the content table for a MangaDex title"""
+        return f"https://mangadex.org/title/{manga_id}"
+
+    @staticmethod
+    def has_expanded_relationships(manga_data: Dict[str, Any]) -> bool:
+        """Check whether a list entry already carries author/artist/cover attributes"""
+        if 'attributes' not in manga_data or 'relationships' not in manga_data:
+            return False
+
+        expanded_types = ('author', 'artist', 'cover_art')
+        return all(
+            'attributes' in rel
+            for rel in manga_data['relationships']
+            if rel['type'] in expanded_types
+        )
+
+    def process_manga_data(self, manga_data: Dict[str, Any]) -> MangaRecord:
         """Process manga data into our format"""
         attributes = manga_data['attributes']
         relationships = manga_data['relationships']
@@ -138,46 +546,77 @@ class MangaDexScraper:
             except (ValueError, TypeError, AttributeError):
                 pass
         
-        return {
-            'title': attributes['title'].get('en') or next(iter(attributes['title'].values())),
-            'description': attributes['description'].get('en', ''),
-            'cover_image': cover_url,
-            'genres': genres,
-            'tags': tags,
-            'authors': authors,
-            'artists': artists,
-            'status': status_map.get(attributes.get('status', 'ongoing'), 'ongoing'),
-            'content_rating': content_rating_map.get(attributes.get('contentRating', 'safe'), 'safe'),
-            'rating': rating,  # Store as a float
-            'total_chapters': 0,  # Will be updated after fetching chapters
-            'content_type': 'manga',
-            'source_url': f"https://mangadex.org/title/{manga_data['id']}",
-            'last_chapter_update': attributes.get('lastChapterUpdateAt'),
-            'created_at': datetime.now().isoformat(),
-            'updated_at': datetime.now().isoformat()
-        }
+        return MangaRecord(
+            title=attributes['title'].get('en') or next(iter(attributes['title'].values())),
+            description=attributes['description'].get('en', ''),
+            cover_image=cover_url,
+            genres=genres,
+            tags=tags,
+            authors=authors,
+            artists=artists,
+            status=status_map.get(attributes.get('status', 'ongoing'), 'ongoing'),
+            content_rating=content_rating_map.get(attributes.get('contentRating', 'safe'), 'safe'),
+            rating=rating,  # Store as a float
+            # total_chapters is maintained by the chapters triggers
+            content_type='manga',
+            source_url=self.manga_source_url(manga_data['id']),
+            last_chapter_update=attributes.get('lastChapterUpdateAt'),
+        )
 
-    async def fetch_chapters(self, manga_id: str) -> List[Dict[str, Any]]:
-        """Fetch chapters for a manga"""
-        if not self.session:
-            raise RuntimeError("Session not initialized. Use async with context.")
-            
-        params = {
-            'manga': manga_id,
-            'translatedLanguage[]': ['en'],
-            'order[chapter]': 'asc',
-            'includes[]': ['scanlation_group']
-        }
-        
-        async with self.session.get(f"{self.base_url}/chapter", params=params) as response:
-            if response.status == 200:
-                data = await response.json()
-                return [self.process_chapter_data(chapter) for chapter in data['data']]
-            else:
-                logger.error(f"Failed to fetch chapters for {manga_id}: {response.status}")
-                return []
+    def list_entry(self, manga_data: Dict[str, Any]) -> MangaListEntry:
+        """Reduce a manga list entry to what the crawl needs, so the raw payload can be dropped
+
+        The list request already expands author, artist and cover_art, so
+        the record is built right away unless that expansion is missing.
+        """
+        attributes = manga_data['attributes']
+        record = self.process_manga_data(manga_data) if self.has_expanded_relationships(manga_data) else None
+        created_at = self.parse_timestamp(attributes.get('createdAt'))
+        return MangaListEntry(
+            manga_data['id'],
+            self.manga_source_url(manga_data['id']),
+            self.parse_timestamp(attributes.get('lastChapterUpdateAt')),
+            created_at.astimezone(timezone.utc).strftime(SHARD_TIME_FORMAT) if created_at else None,
+            record,
+        )
+
+    async def fetch_chapters(self, manga_id: str) -> Optional[List[ChapterRecord]]:
+        """Fetch all chapters for a manga, or None if a feed page couldn't be fetched
 
-    def process_chapter_data(self, chapter_data: Dict[str, Any]) -> Dict[str, Any]:
+        Sort keys follow the feed's chapter order.
+        """
+        chapters: List[ChapterRecord] = []
+        offset = 0
+
+        while True:
+            params = {
+                'limit': CHAPTER_FEED_PAGE_SIZE,
+                'offset': offset,
+                'translatedLanguage[]': ['en'],
+                'order[chapter]': 'asc',
+                'includes[]': ['scanlation_group']
+            }
+
+            data = await self.get_json(f"{self.base_url}/manga/{manga_id}/feed", params)
+            if data is None:
+                logger.error(f"Failed to fetch chapters for {manga_id} at offset {offset}")
+                return None
+
+            page = data.get('data', [])
+            if not page:
+                break
+
+            chapters.extend(self.process_chapter_data(chapter) for chapter in page)
+
+            offset += len(page)
+            if offset >= data.get('total', 0):
+                break
+
+        for chapter, sort_key in zip(chapters, sort_keys(chapter.chapter_number for chapter in chapters)):
+            chapter.sort_key = sort_key
+        return chapters
+
+    def process_chapter_data(self, chapter_data: Dict[str, Any]) -> ChapterRecord:
         """Process chapter data into our format"""
         attributes = chapter_data['attributes']
         relationships = chapter_data['relationships']
@@ -186,105 +625,609 @@ class MangaDexScraper:
         scanlation_group = next((rel for rel in relationships if rel['type'] == 'scanlation_group'), None)
         group_name = scanlation_group['attributes']['name'] if scanlation_group and 'attributes' in scanlation_group else 'Unknown'
         
-        return {
-            'chapter_number': attributes.get('chapter', '0'),
-            'title': attributes.get('title', ''),
-            'source_url': f"https://mangadex.org/chapter/{chapter_data['id']}",
-            'language': attributes.get('translatedLanguage', 'en'),
-            'scanlation_group': group_name,
-            'publish_at': attributes.get('publishAt'),
-            'created_at': datetime.now().isoformat(),
-            'updated_at': datetime.now().isoformat()
-        }
+        return ChapterRecord(
+            chapter_number=attributes.get('chapter', '0'),
+            title=attributes.get('title', ''),
+            source_url=f"https://mangadex.org/chapter/{chapter_data['id']}",
+            language=attributes.get('translatedLanguage', 'en'),
+            scanlation_group=group_name,
+            publish_at=attributes.get('publishAt'),
+        )
+
+    def lookup_existing_content(self, source_urls: List[str]):
+        """Resolve which source URLs are already stored, with a single query"""
+        missing = [url for url in source_urls if url not in self.content_ids]
+        if not missing:
+            return
 
-    async def store_manga(self, manga_data: Dict[str, Any]) -> Optional[str]:
-        """Store manga data in Supabase"""
+        result = self.supabase.table('content').select('id, source_url, last_chapter_update').in_('source_url', missing).execute()
+        for row in result.data:
+            self.content_ids[row['source_url']] = row['id']
+            self.stored_chapter_updates[row['source_url']] = self.parse_timestamp(row.get('last_chapter_update'))
+
+    def upsert_rows(self, table: str, rows: List[Record]) -> List[Dict[str, Any]]:
+        """Upsert records keyed on source_url in batches
+
+        Records are turned into dicts one batch at a time. A failed batch is
+        retried row by row so one bad row doesn't lose the rest of the
+        batch. Returns the rows that couldn't be written.
+        """
+        stored = 0
+        failed: List[Dict[str, Any]] = []
+        updated_at = datetime.now().isoformat()
+
+        for i in range(0, len(rows), self.write_batch_size):
+            batch = [row.to_row(updated_at) for row in rows[i:i + self.write_batch_size]]
+            try:
+                self.supabase.table(table).upsert(
+                    batch, on_conflict='source_url', returning=ReturnMethod.minimal
+                ).execute()
+                stored += len(batch)
+                continue
+            except Exception as e:
+                logger.warning(f"Batch upsert of {len(batch)} rows into {table} failed, retrying one by one: {e}")
+
+            for row in batch:
+                try:
+                    self.supabase.table(table).upsert(
+                        row, on_conflict='source_url', returning=ReturnMethod.minimal
+                    ).execute()
+                    stored += 1
+                except Exception as e:
+                    logger.error(f"Error storing {table} row {row.get('source_url')}: {e}")
+                    failed.append(row)
+
+        metrics.inc('scraper_db_rows_written_total', stored, scraper='mangadex', table=table)
+        return failed
+
+    async def run_db(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Run a blocking Supabase call on the writer thread pool"""
+        loop = asyncio.get_running_loop()
+        with metrics.timer('scraper_db_seconds', scraper='mangadex', operation=func.__name__):
+            return await loop.run_in_executor(self.db_executor, functools.partial(func, *args))
+
+    def store_manga_rows(self, rows: List[MangaRecord]) -> Dict[str, str]:
+        """Upsert content rows and return their ids keyed by source_url
+
+        last_chapter_update is left out: it is only written once the
+        chapters of the title have been stored.
+        """
+        content_ids: Dict[str, str] = {}
+        updated_at = datetime.now().isoformat()
+        payload = [row.to_row(updated_at) for row in rows]
+        for row in payload:
+            del row['last_chapter_update']
         try:
-            result = self.supabase.table('content').insert(manga_data).execute()
-            content_id = result.data[0]['id']
-            logger.info(f"Stored manga: {manga_data['title']}")
-            return content_id
+            result = self.supabase.table('content').upsert(payload, on_conflict='source_url').execute()
+            for row in result.data:
+                content_ids[row['source_url']] = row['id']
         except Exception as e:
-            logger.error(f"Error storing manga {manga_data['title']}: {e}")
-            return None
+            if len(rows) == 1:
+                logger.error(f"Error storing manga {rows[0].title}: {e}")
+                return content_ids
+            logger.warning(f"Batch upsert of {len(rows)} manga failed, retrying one by one: {e}")
+            for row in rows:
+                content_ids.update(self.store_manga_rows([row]))
+            return content_ids
 
-    async def store_chapters(self, chapters: List[Dict[str, Any]], content_id: str):
-        """Store chapter data in Supabase"""
-        if not chapters:
-            return
+        for row in rows:
+            if row.source_url in content_ids:
+                logger.info(f"Stored manga: {row.title}")
+        self.content_ids.update(content_ids)
+        return content_ids
 
+    def write_chapters(self, chapters: List[ChapterRecord], content_id: str, last_chapter_update: Optional[str] = None) -> int:
+        """Upsert the chapters of a content row, recording its latest chapter time once all are stored"""
+        for chapter in chapters:
+            chapter.content_id = content_id
+
+        failed = self.upsert_rows('chapters', chapters)
+        stored = len(chapters) - len(failed)
+        logger.info(f"Stored {stored}/{len(chapters)} chapters for content {content_id}")
+        if not failed:
+            self.update_last_chapter_update(content_id, last_chapter_update)
+        return stored
+
+    def update_last_chapter_update(self, content_id: str, last_chapter_update: Optional[str]):
+        """Record the latest chapter time in the content table
+
+        total_chapters isn't written here: the statement-level triggers on
+        chapters keep it in step with the rows actually stored.
+        """
+        if not last_chapter_update:
+            return
         try:
-            # Update total chapters count in content table
-            total_chapters = len(chapters)
             self.supabase.table('content').update({
-                'total_chapters': total_chapters,
+                'last_chapter_update': last_chapter_update,
                 'updated_at': datetime.now().isoformat()
             }).eq('id', content_id).execute()
-            logger.info(f"Updated total chapters count to {total_chapters} for content {content_id}")
-
-            # Store chapters in batches
-            batch_size = 50
-            for i in range(0, len(chapters), batch_size):
-                batch = chapters[i:i + batch_size]
-                for chapter in batch:
-                    chapter['content_id'] = content_id
-                self.supabase.table('chapters').insert(batch).execute()
-                logger.info(f"Stored {len(batch)} chapters")
         except Exception as e:
-            logger.error(f"Error storing chapters: {e}")
+            logger.error(f"Error updating last chapter time for content {content_id}: {e}")
+
+    def store_batch(self, items: List[Tuple[MangaRecord, Optional[List[ChapterRecord]]]]) -> int:
+        """Write a coalesced batch of fetched manga and their chapters
+
+        New titles go out in one upsert and the chapters of every title in
+        the batch share the same upsert batches. A title's last_chapter_update
+        is only recorded once all of its chapters are stored, as incremental
+        crawls skip titles by it; chapters of None mean the feed couldn't be
+        fetched. Returns the number of manga whose chapters were written.
+        """
+        new_manga = [manga_data for manga_data, _ in items if manga_data.source_url not in self.content_ids]
+        if new_manga:
+            self.store_manga_rows(new_manga)
+
+        chapters: List[ChapterRecord] = []
+        fetched: List[Tuple[MangaRecord, str]] = []
+        stored = 0
+        for manga_data, manga_chapters in items:
+            content_id = self.content_ids.get(manga_data.source_url)
+            if not content_id or manga_chapters is None:
+                self.hold_watermark(manga_data.last_chapter_update)
+                continue
+
+            stored += 1
+            fetched.append((manga_data, content_id))
+            for chapter in manga_chapters:
+                chapter.content_id = content_id
+            chapters.extend(manga_chapters)
+
+        failed_content: Set[str] = set()
+        if chapters:
+            failed = self.upsert_rows('chapters', chapters)
+            failed_content = {row['content_id'] for row in failed}
+            logger.info(f"Stored {len(chapters) - len(failed)}/{len(chapters)} chapters for {stored} manga")
+
+        for manga_data, content_id in fetched:
+            if content_id in failed_content:
+                self.hold_watermark(manga_data.last_chapter_update)
+                continue
+            # An unchanged value needs no write
+            if self.stored_chapter_updates.get(manga_data.source_url) != self.parse_timestamp(manga_data.last_chapter_update):
+                self.update_last_chapter_update(content_id, manga_data.last_chapter_update)
+
+        return stored
+
+    async def store_manga(self, manga_data: MangaRecord) -> Optional[str]:
+        """Store manga data in Supabase, updating the row if the source_url already exists"""
+        content_ids = await self.run_db(self.store_manga_rows, [manga_data])
+        return content_ids.get(manga_data.source_url)
+
+    async def store_chapters(self, chapters: List[ChapterRecord], content_id: str, last_chapter_update: Optional[str] = None):
+        """Store chapter data in Supabase, updating chapters that were stored before"""
+        if not chapters:
+            return
+
+        await self.run_db(self.write_chapters, chapters, content_id, last_chapter_update)
+
+    async def produce_manga(self, manga_queue: asyncio.Queue, limit: int) -> bool:
+        """Page through the manga list and feed entries to the fetch workers
+
+        Returns True once the end of the list or the watermark is reached,
+        and False when a list page couldn't be fetched.
+        """
+        offset = self.checkpoint.offset
 
-    async def scrape_all_manga(self, limit: int = 100):
-        """Scrape manga and chapters from MangaDex"""
-        offset = 0
-        total_processed = 0
-        
         while True:
-            manga_list = await self.fetch_manga_list(offset, limit)
+            manga_list = await self.fetch_manga_page(offset, limit)
+            if manga_list is None:
+                return False
             if not manga_list:
-                break
-                
-            for manga in manga_list:
-                try:
-                    manga_data = await self.fetch_manga_details(manga['id'])
-                    if not manga_data:
-                        continue
-                        
-                    # Check if manga already exists
-                    existing = self.supabase.table('content').select('id').eq('source_url', manga_data['source_url']).execute()
-                    if existing.data:
-                        content_id = existing.data[0]['id']
-                        logger.info(f"Manga already exists: {manga_data['title']}")
+                return True
+            entries = [self.list_entry(manga) for manga in manga_list]
+            del manga_list
+
+            for entry in entries:
+                updated_at = entry.last_chapter_update
+                if updated_at and (not self.latest_update_seen or updated_at > self.latest_update_seen):
+                    self.latest_update_seen = updated_at
+
+            # The list is ordered by latest upload, so everything past the
+            # watermark was already synced by the previous crawl
+            reached_watermark = False
+            if self.watermark:
+                fresh = []
+                for entry in entries:
+                    if entry.last_chapter_update and entry.last_chapter_update <= self.watermark:
+                        reached_watermark = True
                     else:
-                        content_id = await self.store_manga(manga_data)
-                        if not content_id:
-                            continue
-                    
-                    # Fetch and store chapters
-                    chapters = await self.fetch_chapters(manga['id'])
-                    await self.store_chapters(chapters, content_id)
-                    
-                    total_processed += 1
-                    logger.info(f"Processed {total_processed} manga")
-                    
-                    # Add delay between manga
-                    await asyncio.sleep(2)
-                    
-                except Exception as e:
-                    logger.error(f"Error processing manga {manga['id']}: {e}")
+                        fresh.append(entry)
+                entries = fresh
+
+            source_urls = [entry.source_url for entry in entries]
+            try:
+                await self.run_db(self.lookup_existing_content, source_urls)
+            except Exception as e:
+                logger.error(f"Error looking up existing manga at offset {offset}: {e}")
+
+            self.checkpoint.add_page(offset, limit, source_urls)
+            self.checkpoint.latest_update_seen = self.latest_update_seen.isoformat() if self.latest_update_seen else None
+            self.checkpoint.save()
+
+            queued = 0
+            for entry in entries:
+                if entry.source_url in self.checkpoint.completed:
                     continue
-            
+                await manga_queue.put(entry)
+                queued += 1
+
+            logger.info(f"Queued {queued} manga from offset {offset}")
+            if reached_watermark:
+                logger.info(f"Reached sync watermark {self.watermark.isoformat()}, stopping")
+                return True
             offset += limit
-            # Add delay between pages
-            await asyncio.sleep(5)
+
+    async def fetch_worker(self, manga_queue: asyncio.Queue, write_queue: asyncio.Queue):
+        """Fetch details and chapters for queued manga and hand them to the writer"""
+        while True:
+            manga = await manga_queue.get()
+            source_url = manga.source_url
+            handed_off = False
+            try:
+                # In incremental mode titles whose chapters haven't changed since
+                # they were stored don't need their feed fetched again
+                if self.incremental:
+                    updated_at = manga.last_chapter_update
+                    if source_url in self.content_ids and updated_at and self.stored_chapter_updates.get(source_url) == updated_at:
+                        self.unchanged_skipped += 1
+                        continue
+
+                # The detail endpoint is only needed when the list entry
+                # lacked the author/artist/cover_art expansion
+                if manga.record:
+                    manga_data = manga.record
+                    self.detail_calls_avoided += 1
+                else:
+                    manga_data = await self.fetch_manga_details(manga.id)
+                    if not manga_data:
+                        self.hold_watermark(manga.last_chapter_update)
+                        continue
+
+                chapters = await self.fetch_chapters(manga.id)
+                await write_queue.put((manga_data, chapters))
+                handed_off = True
+            except Exception as e:
+                logger.error(f"Error processing manga {manga.id}: {e}")
+                self.hold_watermark(manga.last_chapter_update)
+            finally:
+                if not handed_off:
+                    self.checkpoint.complete(source_url)
+                manga_queue.task_done()
+
+    async def write_worker(self, write_queue: asyncio.Queue):
+        """Store fetched manga and chapters in Supabase
+
+        Whatever has queued up while the previous write was in flight is
+        coalesced into the next write, up to write_coalesce manga.
+        """
+        while True:
+            items = [await write_queue.get()]
+            while len(items) < self.write_coalesce and not write_queue.empty():
+                items.append(write_queue.get_nowait())
+
+            try:
+                # Existing titles were resolved in bulk when their list page was queued
+                stored = await self.run_db(self.store_batch, items)
+                metrics.inc('scraper_manga_processed_total', stored, scraper='mangadex')
+                self.total_processed += stored
+                logger.info(f"Processed {self.total_processed} manga")
+            except Exception as e:
+                logger.error(f"Error storing batch of {len(items)} manga: {e}")
+                for manga_data, _ in items:
+                    self.hold_watermark(manga_data.last_chapter_update)
+            finally:
+                for manga_data, chapters in items:
+                    self.checkpoint.complete(manga_data.source_url, len(chapters or ()))
+                    write_queue.task_done()
+                if self.unsynced_updates:
+                    self.checkpoint.unsynced_before = min(self.unsynced_updates).isoformat()
+                try:
+                    self.checkpoint.save()
+                except OSError as e:
+                    logger.error(f"Error saving checkpoint: {e}")
+
+    async def scrape_all_manga(self, limit: int = 100, resume: bool = False):
+        """Scrape manga and chapters from MangaDex
+
+        List pages feed a bounded queue consumed by max_workers fetch workers,
+        which in turn feed db_workers writers running Supabase calls off the
+        event loop, so HTTP requests and database writes overlap while the
+        request budget keeps the overall rate in check.
+
+        With resume=True the crawl continues from the saved checkpoint,
+        skipping manga that were already finished.
+        """
+        self.total_processed = 0
+        self.detail_calls_avoided = 0
+        self.unchanged_skipped = 0
+        self.latest_update_seen = None
+        self.unsynced_updates = []
+        self.checkpoint = CrawlCheckpoint(self.checkpoint.path)
+        if resume and self.checkpoint.load():
+            self.latest_update_seen = self.parse_timestamp(self.checkpoint.latest_update_seen)
+            self.hold_watermark(self.checkpoint.unsynced_before)
+            logger.info(
+                f"Resuming from offset {self.checkpoint.offset} "
+                f"(last manga {self.checkpoint.last_manga_id}, {len(self.checkpoint.completed)} already done)"
+            )
+        self.watermark = self.load_watermark() if self.incremental else None
+        if self.watermark:
+            logger.info(f"Incremental crawl from watermark {self.watermark.isoformat()}")
+
+        finished = False
+
+        async def produce(manga_queue: asyncio.Queue):
+            nonlocal finished
+            finished = await self.produce_manga(manga_queue, limit)
+
+        await self.run_pipeline(produce)
+
+        # Only a crawl that ran to completion may move the watermark forward
+        if not finished:
+            raise RuntimeError(
+                f"Manga list request failed, stopped at offset {self.checkpoint.offset} "
+                f"keeping the checkpoint and the previous sync watermark"
+            )
+        self.save_watermark()
+        self.checkpoint.clear()
+
+        logger.info(
+            f"Finished scraping: processed {self.total_processed} manga, "
+            f"avoided {self.detail_calls_avoided} detail requests, "
+            f"skipped {self.unchanged_skipped} unchanged"
+        )
+
+    async def run_pipeline(self, produce: Callable[[asyncio.Queue], Awaitable[Any]]):
+        """Run fetch and write workers while produce(manga_queue) feeds them, until all is stored"""
+        manga_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        write_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+
+        metrics.register_gauge('scraper_queue_depth', manga_queue.qsize, scraper='mangadex', queue='fetch')
+        metrics.register_gauge('scraper_queue_depth', write_queue.qsize, scraper='mangadex', queue='write')
+
+        workers = [
+            asyncio.create_task(self.fetch_worker(manga_queue, write_queue))
+            for _ in range(self.max_workers)
+        ]
+        writers = [
+            asyncio.create_task(self.write_worker(write_queue))
+            for _ in range(self.db_workers)
+        ]
+
+        try:
+            await produce(manga_queue)
+            await manga_queue.join()
+            await write_queue.join()
+        finally:
+            for task in workers + writers:
+                task.cancel()
+            await asyncio.gather(*workers, *writers, return_exceptions=True)
+
+    def renew_shard(self, shard: Dict[str, Any], leases: CrawlLeases, cursor: ShardCursor) -> bool:
+        """Extend a shard's lease with the position of its first page that isn't fully stored yet"""
+        cursor_since, cursor_offset = cursor.current(self.checkpoint.offset)
+        processed = shard['processed'] + self.total_processed
+        return leases.renew(shard['id'], shard['owner'], cursor_since, cursor_offset, processed)
+
+    async def renew_shard_lease(self, shard: Dict[str, Any], leases: CrawlLeases, cursor: ShardCursor):
+        """Keep renewing a shard's lease while its pipeline runs, including while the queues drain"""
+        while True:
+            await asyncio.sleep(leases.lease_seconds / 3)
+            if not self.renew_shard(shard, leases, cursor):
+                logger.warning(f"Lost the lease on shard {shard['id']}")
+                return
+
+    async def produce_shard(self, manga_queue: asyncio.Queue, shard: Dict[str, Any], leases: CrawlLeases, cursor: ShardCursor, limit: int) -> bool:
+        """Feed the manga created within a shard's time range to the fetch workers
+
+        The list is read in creation order starting at createdAtSince. As
+        offsets are capped at MAX_LIST_WINDOW, the window moves to the
+        creation time reached whenever it fills up. The lease is renewed
+        after every page with the position of the first page that isn't
+        fully stored yet. Returns True once the end of the range is reached.
+        """
+        position = cursor.next_position
+        page = 0
+
+        while True:
+            since, offset = position
+            manga_list = await self.fetch_manga_page(offset, limit, created_since=since or None, order=('createdAt', 'asc'))
+            if manga_list is None:
+                return False
+            last_page = len(manga_list) < limit
+            entries = [self.list_entry(manga) for manga in manga_list]
+            del manga_list
+
+            if shard['until'] and any(entry.created_at and entry.created_at >= shard['until'] for entry in entries):
+                entries = [entry for entry in entries if not entry.created_at or entry.created_at < shard['until']]
+                last_page = True
+
+            source_urls = [entry.source_url for entry in entries]
+            try:
+                await self.run_db(self.lookup_existing_content, source_urls)
+            except Exception as e:
+                logger.error(f"Error looking up existing manga in shard {shard['id']}: {e}")
+
+            cursor.positions[page] = position
+            self.checkpoint.add_page(page, 1, source_urls)
+            for entry in entries:
+                await manga_queue.put(entry)
+
+            if offset + 2 * limit <= MAX_LIST_WINDOW:
+                position = (since, offset + limit)
+            else:
+                created = [entry.created_at for entry in entries if entry.created_at]
+                if not last_page and (not created or max(created) <= since):
+                    logger.error(f"Shard {shard['id']} has more than {MAX_LIST_WINDOW} manga created at {since}, giving up")
+                    return False
+                # Titles created at exactly that time are listed again, which upserts leave unchanged
+                position = (max(created), 0) if created else position
+            page += 1
+
+            cursor.next_position = position
+            if not self.renew_shard(shard, leases, cursor):
+                logger.warning(f"Lost the lease on shard {shard['id']}, stopping")
+                return False
+
+            if last_page:
+                return True
+
+    async def scrape_shard(self, shard: Dict[str, Any], leases: CrawlLeases, limit: int = 100) -> bool:
+        """Crawl one leased shard, returning whether it was finished"""
+        self.total_processed = 0
+        self.checkpoint = CrawlCheckpoint(None)
+        cursor = ShardCursor((shard['cursor_since'], shard['cursor_offset']))
+        finished = False
+
+        async def produce(manga_queue: asyncio.Queue):
+            nonlocal finished
+            finished = await self.produce_shard(manga_queue, shard, leases, cursor, limit)
+
+        logger.info(f"Crawling shard {shard['id']} [{shard['since'] or '-'}, {shard['until'] or '-'}) from {shard['cursor_since'] or 'start'} +{shard['cursor_offset']}")
+        heartbeat = asyncio.create_task(self.renew_shard_lease(shard, leases, cursor))
+        try:
+            await self.run_pipeline(produce)
+        except BaseException:
+            # Interrupted: hand the shard back so a restarted worker continues it right away
+            leases.release(shard['id'], shard['owner'])
+            raise
+        finally:
+            heartbeat.cancel()
+            await asyncio.gather(heartbeat, return_exceptions=True)
+
+        if finished and not leases.complete(shard['id'], shard['owner'], shard['processed'] + self.total_processed):
+            logger.warning(f"Lost the lease on shard {shard['id']} before it finished, leaving it to its new owner")
+            finished = False
+        elif finished:
+            logger.info(f"Shard {shard['id']} finished after {self.total_processed} manga")
+        else:
+            # Keeping the lease until it expires backs off before the shard is retried
+            logger.warning(f"Shard {shard['id']} stopped after {self.total_processed} manga, it is retried once its lease expires")
+        return finished
+
+    async def crawl_shards(self, leases: CrawlLeases, limit: int = 100, owner: Optional[str] = None):
+        """Keep claiming and crawling shards until none are left"""
+        owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+        while True:
+            shard = leases.claim(owner)
+            if not shard:
+                break
+            await self.scrape_shard(shard, leases, limit)
+
+        done, total = leases.progress()
+        logger.info(f"{owner} found no shard left to claim ({done}/{total} shards done)")
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Scrape manga and chapters from MangaDex")
+    parser.add_argument('--workers', type=int, default=4, help="Number of concurrent fetch workers")
+    parser.add_argument('--rate', type=float, default=5.0, help="Maximum requests per second across all workers")
+    parser.add_argument('--page-size', type=int, default=100, help="Number of manga per list page")
+    parser.add_argument('--batch-size', type=int, default=50, help="Number of rows per upsert request")
+    parser.add_argument('--resume', action='store_true', help="Continue an interrupted crawl from its checkpoint")
+    parser.add_argument('--checkpoint-file', default='.mangadex_checkpoint.json', help="Where crawl progress is checkpointed")
+    parser.add_argument('--metrics-port', type=int, help="Serve Prometheus metrics on this port")
+    parser.add_argument('--metrics-file', help="Periodically write a JSON metrics snapshot to this file")
+    parser.add_argument('--cache-dir', help="Cache API responses on disk in this directory")
+    parser.add_argument('--offline', action='store_true', help="Serve every request from the cache (needs --cache-dir)")
+    parser.add_argument('--db-workers', type=int, default=2, help="Number of threads writing to Supabase")
+    parser.add_argument('--incremental', action='store_true', help="Stop at titles already synced by the previous crawl")
+    parser.add_argument('--state-file', default='.mangadex_sync.json', help="Where the incremental sync watermark is kept")
+    parser.add_argument('--lease-db', help="Crawl in creation time shards coordinated through this SQLite lease table")
+    parser.add_argument('--processes', type=int, default=1, help="Worker processes claiming shards (with --lease-db)")
+    parser.add_argument('--shard-months', type=int, default=6, help="Months of title creation time per shard")
+    parser.add_argument('--shard-start', default='2018-01-01', help="Creation date where the first bounded shard starts")
+    parser.add_argument('--lease-seconds', type=float, default=600, help="How long a shard stays leased without progress")
+    parser.add_argument('--bulk-import', action='store_true', help="Defer search vector indexing until the crawl is done")
+    parser.add_argument('--search-batch-size', type=int, default=1000, help="Rows per search vector rebuild batch")
+    parser.add_argument('--search-defer-seconds', type=int, default=600, help="How long a bulk import's search vector deferral lasts unless renewed")
+    args = parser.parse_args()
+    # Each worker process has its own registry, so there is no single one to serve
+    if args.metrics_port and args.lease_db and args.processes > 1:
+        parser.error("--metrics-port can't be used with --processes > 1; --metrics-file writes a snapshot per process")
+    return args
+
+def run_shard_process(args: argparse.Namespace, index: int):
+    """Entry point of a shard worker process, with its share of the request rate"""
+    args.rate = args.rate / args.processes
+    if args.metrics_file:
+        args.metrics_file = f"{args.metrics_file}.{index}"
+    asyncio.run(crawl(args))
 
 async def main():
     """Main entry point"""
+    args = parse_args()
+
+    if args.lease_db:
+        leases = CrawlLeases(args.lease_db, args.lease_seconds)
+        ranges = shard_ranges(datetime.strptime(args.shard_start, '%Y-%m-%d'), datetime.now(), args.shard_months)
+        if leases.add_shards(ranges):
+            logger.info(f"Planned {len(ranges)} shards in {args.lease_db}")
+        else:
+            done, total = leases.progress()
+            logger.info(f"Continuing the crawl planned in {args.lease_db} ({done}/{total} shards done)")
+        leases.close()
+
+    # Full-text indexing is skipped per row during a bulk import and done in batches afterwards
+    supabase = supabase_client()
+    deferral = None
+    if args.bulk_import:
+        await asyncio.to_thread(set_search_vector_deferred, supabase, args.search_defer_seconds)
+        deferral = asyncio.create_task(keep_search_vectors_deferred(supabase, args.search_defer_seconds))
+        logger.info("Search vector indexing deferred")
+    else:
+        # Catch up rows left stale by a bulk import that was killed before its rebuild
+        await asyncio.to_thread(rebuild_search_vectors, supabase, args.search_batch_size)
+
     try:
-        async with MangaDexScraper() as scraper:
-            await scraper.scrape_all_manga()
+        if args.lease_db and args.processes > 1:
+            # spawn rather than fork, as this process already runs an event loop
+            context = multiprocessing.get_context('spawn')
+            processes = [context.Process(target=run_shard_process, args=(args, index)) for index in range(args.processes)]
+            for process in processes:
+                process.start()
+            await asyncio.gather(*(asyncio.to_thread(process.join) for process in processes))
+            failed = [process.pid for process in processes if process.exitcode]
+            if failed:
+                raise RuntimeError(f"Shard worker processes {failed} failed")
+        else:
+            await crawl(args)
+    finally:
+        if deferral:
+            deferral.cancel()
+            await asyncio.gather(deferral, return_exceptions=True)
+            await asyncio.to_thread(set_search_vector_deferred, supabase, 0)
+            logger.info("Search vector indexing resumed")
+            await asyncio.to_thread(rebuild_search_vectors, supabase, args.search_batch_size)
+
+async def crawl(args: argparse.Namespace):
+    """Run one crawler in this process"""
+    cache = ResponseCache(args.cache_dir, offline=args.offline) if args.cache_dir else None
+    try:
+        async with metrics.exporting(args.metrics_port, args.metrics_file), MangaDexScraper(
+            max_workers=args.workers,
+            requests_per_second=args.rate,
+            write_batch_size=args.batch_size,
+            incremental=args.incremental,
+            sync_state_path=args.state_file,
+            db_workers=args.db_workers,
+            checkpoint_path=args.checkpoint_file,
+            cache=cache,
+        ) as scraper:
+            if args.lease_db:
+                leases = CrawlLeases(args.lease_db, args.lease_seconds)
+                try:
+                    await scraper.crawl_shards(leases, limit=args.page_size)
+                finally:
+                    leases.close()
+            else:
+                await scraper.scrape_all_manga(limit=args.page_size, resume=args.resume)
     except Exception as e:
         logger.error(f"Fatal error: {e}")
         raise
+    finally:
+        if cache:
+            cache.close()
 
 if __name__ == "__main__":
     asyncio.run(main()) 
\ No newline at end of file
@@ -17,6 +17,12 @@ const nextConfig = {
         protocol: 'https',
         hostname: '**.mangadex.org',
         pathname: '/**',
+      },
+      {
+        // Covers and pages mirrored into Supabase Storage (scraper/mirror_images.py)
+        protocol: 'https',
+        hostname: '**.supabase.co',
+        pathname: '/storage/v1/object/public/**',
       }
     ],
   },
@@ -0,0 +1,200 @@
+"""Record MangaDex / madarascans fixtures and benchmark the crawlers against a local replay
+
+    python scraper/benchmark.py record --fixtures fixtures --mangadex-pages 2 --manhwa-pages 1
+    python scraper/benchmark.py run --fixtures fixtures --latency 0.05
+
+Fixtures are ResponseCache directories (fixtures/mangadex, fixtures/madarascans),
+so a crawl run with --cache-dir can be replayed as well.
+"""
+import argparse
+import asyncio
+import importlib
+import json
+import logging
+import os
+import sys
+import tempfile
+from typing import Any, Dict, Optional
+
+# mangadex_scraper.py lives at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from http_cache import ResponseCache
+from manhwa_http_scraper import HttpManhwaScraper
+from replay import FAKE_SUPABASE_KEY, FakePostgrest, ReplayServer, Stopwatch, print_report, rates
+
+logger = logging.getLogger(__name__)
+
+MANGADEX_ORIGIN = "https://api.mangadex.org"
+MADARASCANS_ORIGIN = "https://madarascans.com"
+
+
+def use_fake_supabase(url: str):
+    """Point both Supabase configurations (root .env.local and scraper/.env) at url"""
+    os.environ['NEXT_PUBLIC_SUPABASE_URL'] = url
+    os.environ['SUPABASE_SERVICE_ROLE_KEY'] = FAKE_SUPABASE_KEY
+    os.environ['SUPABASE_URL'] = url
+    os.environ['SUPABASE_KEY'] = FAKE_SUPABASE_KEY
+
+
+async def record_mangadex(fixtures_dir: str, pages: int, page_size: int):
+    """Record manga list pages and the chapter feeds of every title on them
+
+    An empty list page is stored after the recorded ones, so a replayed
+    scrape_all_manga ends there as it would at the end of the catalog.
+    """
+    from mangadex_scraper import MangaDexScraper
+
+    cache = ResponseCache(os.path.join(fixtures_dir, 'mangadex'), ttls=[], default_ttl=0)
+    fake_db = FakePostgrest()
+    use_fake_supabase(await fake_db.start())
+    try:
+        async with MangaDexScraper(cache=cache) as scraper:
+            for page in range(pages):
+                manga_list = await scraper.fetch_manga_list(page * page_size, page_size)
+                for manga in manga_list:
+                    await scraper.fetch_chapters(manga['id'])
+                print(f"Recorded MangaDex page {page + 1} ({len(manga_list)} manga)")
+
+            end = {'result': 'ok', 'response': 'collection', 'data': [], 'limit': page_size, 'offset': pages * page_size, 'total': pages * page_size}
+            cache.store(
+                f"{MANGADEX_ORIGIN}/manga", scraper.manga_list_params(pages * page_size, page_size),
+                200, {'Content-Type': 'application/json'}, json.dumps(end)
+            )
+    finally:
+        cache.close()
+        await fake_db.stop()
+
+
+async def record_madarascans(fixtures_dir: str, pages: int, chapters_per_series: int):
+    """Record series list pages, chapter lists and the newest chapters' reader pages"""
+    cache = ResponseCache(os.path.join(fixtures_dir, 'madarascans'), ttls=[], default_ttl=0)
+    scraper = HttpManhwaScraper(cache=cache)
+    await scraper.initialize()
+    try:
+        for page in range(1, pages + 1):
+            manhwa_list = await scraper.get_manhwa_list(page)
+            for manhwa in manhwa_list:
+                chapters = await scraper.get_chapter_list(manhwa['url'])
+                await scraper.get_chapter_images_bulk([chapter['url'] for chapter in chapters[:chapters_per_series]])
+            print(f"Recorded madarascans page {page} ({len(manhwa_list)} series)")
+    finally:
+        await scraper.close()
+        cache.close()
+
+
+async def bench_scrape_all_manga(fixtures_dir: str, latency: float, page_size: int, workers: int) -> Dict[str, Any]:
+    """Run MangaDexScraper.scrape_all_manga against the replayed API and a fake database"""
+    replay = ReplayServer(os.path.join(fixtures_dir, 'mangadex'), MANGADEX_ORIGIN, latency=latency)
+    fake_db = FakePostgrest(latency=latency)
+    replay_url = await replay.start()
+    use_fake_supabase(await fake_db.start())
+
+    from mangadex_scraper import MangaDexScraper
+
+    try:
+        with tempfile.TemporaryDirectory() as state_dir:
+            async with MangaDexScraper(
+                max_workers=workers,
+                requests_per_second=0,
+                checkpoint_path=os.path.join(state_dir, 'checkpoint.json'),
+                sync_state_path=os.path.join(state_dir, 'sync.json'),
+            ) as scraper:
+                scraper.base_url = replay_url
+                stopwatch = Stopwatch()
+                await scraper.scrape_all_manga(limit=page_size)
+                elapsed = stopwatch.elapsed
+
+        # Every request of the crawl should have been recorded, or the numbers are for a different crawl
+        if replay.missing:
+            raise RuntimeError(f"{replay.missing} MangaDex requests weren't in the fixtures; record them again with --page-size {page_size}")
+
+        return rates(
+            elapsed,
+            manga=scraper.total_processed,
+            chapters=fake_db.rows_written.get('chapters', 0),
+            db_writes=fake_db.write_requests,
+            http_requests=replay.served,
+        )
+    finally:
+        await replay.stop()
+        await fake_db.stop()
+
+
+async def bench_import_manhwa(fixtures_dir: str, latency: float, pages: int, concurrency: int) -> Dict[str, Any]:
+    """Run manhwa_import.import_manhwa against the replayed site and a fake database"""
+    replay = ReplayServer(os.path.join(fixtures_dir, 'madarascans'), MADARASCANS_ORIGIN, latency=latency)
+    fake_db = FakePostgrest(latency=latency)
+    replay_url = await replay.start()
+    use_fake_supabase(await fake_db.start())
+
+    # manhwa_import creates its Supabase client at import time
+    manhwa_import = importlib.reload(importlib.import_module('manhwa_import'))
+
+    try:
+        stopwatch = Stopwatch()
+        await manhwa_import.import_manhwa(pages, concurrency=concurrency, base_url=replay_url)
+        elapsed = stopwatch.elapsed
+
+        return rates(
+            elapsed,
+            manhwa=fake_db.rows_written.get('manhwa', 0),
+            chapters=fake_db.rows_written.get('chapters', 0),
+            db_writes=fake_db.write_requests,
+            http_requests=replay.served,
+        )
+    finally:
+        await replay.stop()
+        await fake_db.stop()
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Record fixtures and benchmark the crawlers")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    record = subparsers.add_parser('record', help="Record live responses into fixtures")
+    record.add_argument('--fixtures', default='fixtures', help="Fixture directory")
+    record.add_argument('--mangadex-pages', type=int, default=1, help="MangaDex list pages to record")
+    record.add_argument('--manhwa-pages', type=int, default=1, help="madarascans list pages to record")
+    record.add_argument('--page-size', type=int, default=20, help="Manga per MangaDex list page")
+    record.add_argument('--chapters-per-series', type=int, default=5, help="Reader pages to record per series")
+
+    run = subparsers.add_parser('run', help="Benchmark against recorded fixtures")
+    run.add_argument('--fixtures', default='fixtures', help="Fixture directory")
+    run.add_argument('--latency', type=float, default=0.0, help="Seconds added to every replayed response")
+    run.add_argument('--page-size', type=int, default=20, help="Must match the recorded page size")
+    run.add_argument('--manhwa-pages', type=int, default=1, help="madarascans list pages to import")
+    run.add_argument('--workers', type=int, default=4, help="Fetch workers / chapter concurrency")
+    run.add_argument('--only', choices=['mangadex', 'manhwa'], help="Run a single benchmark")
+    run.add_argument('--output', help="Also write the results as JSON to this file")
+
+    return parser.parse_args()
+
+
+async def main():
+    """Main entry point"""
+    logging.basicConfig(level=logging.WARNING)
+    args = parse_args()
+
+    if args.command == 'record':
+        if args.mangadex_pages:
+            await record_mangadex(args.fixtures, args.mangadex_pages, args.page_size)
+        if args.manhwa_pages:
+            await record_madarascans(args.fixtures, args.manhwa_pages, args.chapters_per_series)
+        return
+
+    results: Dict[str, Optional[Dict[str, Any]]] = {}
+    if args.only in (None, 'mangadex'):
+        results['scrape_all_manga'] = await bench_scrape_all_manga(args.fixtures, args.latency, args.page_size, args.workers)
+        print_report('scrape_all_manga', results['scrape_all_manga'])
+    if args.only in (None, 'manhwa'):
+        results['import_manhwa'] = await bench_import_manhwa(args.fixtures, args.latency, args.manhwa_pages, args.workers)
+        print_report('import_manhwa', results['import_manhwa'])
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    asyncio.run(main())
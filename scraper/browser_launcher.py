@@ -0,0 +1,57 @@
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from playwright.async_api import Browser, BrowserContext, Playwright
+
+logger = logging.getLogger(__name__)
+
+
+async def open_browser_context(
+    playwright: Playwright,
+    headless: bool = True,
+    user_data_dir: Optional[str] = None,
+    cdp_url: Optional[str] = None,
+    args: Optional[List[str]] = None,
+    context_options: Optional[Dict[str, Any]] = None,
+) -> Tuple[Optional[Browser], BrowserContext]:
+    """Get a Chromium context in the cheapest way the options allow
+
+    - cdp_url attaches to an already running browser (e.g. one started with
+      --remote-debugging-port) and reuses its default context, so there is
+      no startup cost at all and its cookies are shared.
+    - user_data_dir launches with a persistent profile, keeping cookies
+      (including cleared challenge cookies) between runs.
+    - otherwise a fresh browser and context are launched.
+
+    Returns (browser, context); browser is None for persistent contexts.
+    """
+    context_options = context_options or {}
+
+    if cdp_url:
+        logger.info(f"Attaching to browser at {cdp_url}")
+        browser = await playwright.chromium.connect_over_cdp(cdp_url)
+        if browser.contexts:
+            return browser, browser.contexts[0]
+        return browser, await browser.new_context(**context_options)
+
+    if user_data_dir:
+        logger.info(f"Launching browser with profile {user_data_dir}")
+        context = await playwright.chromium.launch_persistent_context(
+            user_data_dir,
+            headless=headless,
+            args=args or [],
+            **context_options
+        )
+        return None, context
+
+    browser = await playwright.chromium.launch(headless=headless, args=args or [])
+    return browser, await browser.new_context(**context_options)
+
+
+async def close_browser_context(browser: Optional[Browser], context: Optional[BrowserContext], attached: bool = False):
+    """Close what open_browser_context opened, leaving an attached browser running"""
+    if context and not attached:
+        await context.close()
+    if browser:
+        # For a CDP connection this only disconnects
+        await browser.close()
@@ -0,0 +1,102 @@
+import math
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+# Volume prefixes are dropped before looking for the chapter number ("Vol. 2 Ch. 15" -> 15)
+VOLUME_PATTERN = re.compile(r'\bvol(?:ume)?\.?\s*\d+(?:\.\d+)?', re.IGNORECASE)
+NUMBER_PATTERN = re.compile(r'\d+(?:\.\d+)?')
+
+# Spacing of unnumbered chapters (extras, specials) after the numbered chapter they follow
+EXTRA_STEP = 0.001
+
+
+def chapter_number_value(chapter_number: Union[str, float, int, None]) -> Optional[float]:
+    """Numeric value of a chapter number ("10.5", "Chapter 12", 7.0), or None for extras"""
+    if chapter_number is None:
+        return None
+    if isinstance(chapter_number, (int, float)):
+        return None if math.isnan(chapter_number) else float(chapter_number)
+
+    match = NUMBER_PATTERN.search(VOLUME_PATTERN.sub(' ', chapter_number))
+    return float(match.group()) if match else None
+
+
+def sort_keys(chapter_numbers: Iterable[Union[str, float, int, None]]) -> List[float]:
+    """Sort keys for chapters listed in reading order
+
+    Numbered chapters sort by their number. Unnumbered ones ("Extra",
+    "Special", a bare "Volume 3") are placed right after the numbered
+    chapter before them, or before chapter 0 when nothing precedes them.
+    """
+    keys = []
+    previous = -1.0
+    extras = 0
+    for chapter_number in chapter_numbers:
+        value = chapter_number_value(chapter_number)
+        if value is not None:
+            previous, extras = value, 0
+            keys.append(value)
+        else:
+            extras += 1
+            keys.append(round(previous + extras * EXTRA_STEP, 6))
+    return keys
+
+
+def order_chapters(chapters: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Add a sort_key to chapters scraped newest first and sort them by it, newest first
+
+    The key comes from chapter_number, or from the title when the number
+    is missing.
+    """
+    reading_order = list(reversed(chapters))
+    numbers = [
+        chapter.get('chapter_number') if chapter_number_value(chapter.get('chapter_number')) is not None else chapter.get('title')
+        for chapter in reading_order
+    ]
+    for chapter, key in zip(reading_order, sort_keys(numbers)):
+        chapter['sort_key'] = key
+    return sorted(chapters, key=lambda chapter: chapter['sort_key'], reverse=True)
+
+
+def chapter_page(
+    supabase,
+    parent_id: str,
+    after: Optional[Tuple[float, str]] = None,
+    limit: int = 50,
+    descending: bool = False,
+    parent_column: str = 'content_id',
+    columns: str = '*',
+) -> List[Dict[str, Any]]:
+    """A page of a series' chapters in (sort_key, id) order, continuing after a (sort_key, id) cursor
+
+    Keyset pagination on the (parent, sort_key, id) index, so every page
+    (and the next/previous chapter) is an index lookup however long the
+    series is. Pass the sort_key and id of the last row of a page as
+    after to get the next one.
+    """
+    direction = 'desc' if descending else 'asc'
+    query = supabase.table('chapters').select(columns).eq(parent_column, parent_id)
+    if after:
+        sort_key, chapter_id = after
+        operator = 'lt' if descending else 'gt'
+        # The plain bound lets the index scan start at the cursor; the or()
+        # (added by hand, this postgrest version has no or_()) breaks ties on id
+        query = query.lte('sort_key', sort_key) if descending else query.gte('sort_key', sort_key)
+        query.params = query.params.add(
+            'or', f"(sort_key.{operator}.{sort_key},and(sort_key.eq.{sort_key},id.{operator}.{chapter_id}))"
+        )
+    query.params = query.params.add('order', f"sort_key.{direction},id.{direction}")
+    return query.limit(limit).execute().data
+
+
+def adjacent_chapter(supabase, chapter: Dict[str, Any], previous: bool = False, parent_column: str = 'content_id') -> Optional[Dict[str, Any]]:
+    """The chapter after (or before) a chapter row of the same series, or None"""
+    rows = chapter_page(
+        supabase,
+        chapter[parent_column],
+        after=(chapter['sort_key'], chapter['id']),
+        limit=1,
+        descending=previous,
+        parent_column=parent_column,
+    )
+    return rows[0] if rows else None
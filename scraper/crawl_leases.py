@@ -0,0 +1,127 @@
+import sqlite3
+import time
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Format of MangaDex's createdAtSince filter; also sorts correctly as text
+SHARD_TIME_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+
+def shard_ranges(start: datetime, end: datetime, months: int) -> List[Tuple[str, str]]:
+    """Split creation time into [since, until) ranges of the given number of months
+
+    The first range is open at the start and the last one open at the end
+    (empty strings), so together they cover every title.
+    """
+    months = max(1, months)
+    boundaries = []
+    year, month = start.year, start.month
+    while datetime(year, month, 1) < end:
+        boundaries.append(datetime(year, month, 1).strftime(SHARD_TIME_FORMAT))
+        month += months
+        year, month = year + (month - 1) // 12, (month - 1) % 12 + 1
+
+    edges = [''] + boundaries + ['']
+    return list(zip(edges[:-1], edges[1:]))
+
+
+class CrawlLeases:
+    def __init__(self, path: str = '.mangadex_leases.sqlite', lease_seconds: float = 600):
+        """Lease table coordinating shards of a crawl between worker processes
+
+        Each shard is a [since, until) creation time range. A worker claims
+        a shard that is neither done nor leased by someone else, renews the
+        lease as it goes (storing how far it got) and marks it done at the
+        end. A shard whose lease runs out, because its worker died, is
+        picked up by the next claim from the stored cursor.
+        """
+        self.path = path
+        self.lease_seconds = lease_seconds
+        # Transactions are managed explicitly so claims can take the write lock up front
+        self.db = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS shards (
+                id INTEGER PRIMARY KEY,
+                since TEXT NOT NULL,
+                until TEXT NOT NULL,
+                cursor_since TEXT NOT NULL,
+                cursor_offset INTEGER NOT NULL DEFAULT 0,
+                owner TEXT,
+                lease_expires REAL NOT NULL DEFAULT 0,
+                done INTEGER NOT NULL DEFAULT 0,
+                processed INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+
+    def add_shards(self, ranges: List[Tuple[str, str]]) -> bool:
+        """Create the shard plan, unless a previous run already did
+
+        Returns False when the table already had shards; delete the lease
+        database to plan a new crawl.
+        """
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            if self.db.execute("SELECT COUNT(*) FROM shards").fetchone()[0]:
+                return False
+            self.db.executemany(
+                "INSERT INTO shards (since, until, cursor_since) VALUES (?, ?, ?)",
+                [(since, until, since) for since, until in ranges]
+            )
+            return True
+        finally:
+            self.db.execute("COMMIT")
+
+    def claim(self, owner: str) -> Optional[Dict[str, Any]]:
+        """Lease the first unfinished shard nobody holds, or None when there is none"""
+        now = time.time()
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.db.execute(
+                "SELECT * FROM shards WHERE done = 0 AND (owner IS NULL OR lease_expires < ?) ORDER BY id LIMIT 1",
+                (now,)
+            ).fetchone()
+            if not row:
+                return None
+            if row['owner'] and row['owner'] != owner:
+                logger.warning(f"Taking over shard {row['id']} from {row['owner']} after its lease expired")
+            self.db.execute(
+                "UPDATE shards SET owner = ?, lease_expires = ? WHERE id = ?",
+                (owner, now + self.lease_seconds, row['id'])
+            )
+            return dict(row, owner=owner)
+        finally:
+            self.db.execute("COMMIT")
+
+    def renew(self, shard_id: int, owner: str, cursor_since: str, cursor_offset: int, processed: int) -> bool:
+        """Extend a lease and record progress; False if the lease was lost to another worker"""
+        cursor = self.db.execute(
+            "UPDATE shards SET lease_expires = ?, cursor_since = ?, cursor_offset = ?, processed = ? "
+            "WHERE id = ? AND owner = ? AND done = 0",
+            (time.time() + self.lease_seconds, cursor_since, cursor_offset, processed, shard_id, owner)
+        )
+        return cursor.rowcount == 1
+
+    def complete(self, shard_id: int, owner: str, processed: int) -> bool:
+        """Mark a shard as finished; False if the lease was lost to another worker"""
+        cursor = self.db.execute(
+            "UPDATE shards SET done = 1, owner = NULL, processed = ? WHERE id = ? AND owner = ? AND done = 0",
+            (processed, shard_id, owner)
+        )
+        return cursor.rowcount == 1
+
+    def release(self, shard_id: int, owner: str):
+        """Give a shard back so another worker can continue it right away"""
+        self.db.execute("UPDATE shards SET owner = NULL, lease_expires = 0 WHERE id = ? AND owner = ?", (shard_id, owner))
+
+    def progress(self) -> Tuple[int, int]:
+        """(finished shards, total shards)"""
+        done, total = self.db.execute("SELECT COALESCE(SUM(done), 0), COUNT(*) FROM shards").fetchone()
+        return done, total
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,232 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+import logging
+from typing import Any, Dict, List, Mapping, Optional, Tuple, Union
+from urllib.parse import urlencode, urlparse
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Freshness per endpoint type, first matching pattern wins
+DEFAULT_TTLS: List[Tuple[str, float]] = [
+    (r'api\.mangadex\.org/manga/[0-9a-f-]{36}/feed', 60 * 60),
+    (r'api\.mangadex\.org/manga/[0-9a-f-]{36}', 24 * 60 * 60),
+    (r'api\.mangadex\.org/manga', 10 * 60),
+    (r'api\.mangadex\.org/chapter', 60 * 60),
+    (r'/series/page/\d+', 10 * 60),
+    (r'/series/[^/]+/?$', 60 * 60),
+    # Chapter pages don't change once published
+    (r'madarascans\.com/[^/]+/?$', 30 * 24 * 60 * 60),
+]
+
+# Response headers worth replaying from the cache
+KEPT_HEADERS = ('content-type', 'etag', 'last-modified', 'cache-control')
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        directory: str = '.http_cache',
+        max_bytes: int = 512 * 1024 * 1024,
+        ttls: Optional[List[Tuple[str, float]]] = None,
+        default_ttl: float = 60 * 60,
+        offline: bool = False,
+    ):
+        """On-disk HTTP response cache with conditional revalidation
+
+        Bodies are stored as files named after the request key, with an
+        SQLite index holding validators (ETag / Last-Modified), freshness
+        and last access time for LRU eviction once max_bytes is exceeded.
+        Stale entries are revalidated with If-None-Match/If-Modified-Since.
+        In offline mode every lookup is served from the cache, fresh or
+        not, so crawls can be replayed without network access.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttls = [(re.compile(pattern), ttl) for pattern, ttl in (ttls if ttls is not None else DEFAULT_TTLS)]
+        self.default_ttl = default_ttl
+        self.offline = offline
+
+        os.makedirs(os.path.join(directory, 'bodies'), exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(directory, 'index.sqlite'), check_same_thread=False)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                size INTEGER NOT NULL,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self.db.execute("CREATE INDEX IF NOT EXISTS responses_accessed_idx ON responses(accessed_at)")
+        self.db.commit()
+
+    @staticmethod
+    def full_url(url: str, params: Optional[Mapping[str, Any]] = None) -> str:
+        """URL with its query parameters in a stable order"""
+        if not params:
+            return url
+        pairs = []
+        for name in sorted(params):
+            value = params[name]
+            for item in (value if isinstance(value, (list, tuple)) else [value]):
+                pairs.append((name, str(item)))
+        return f"{url}{'&' if '?' in url else '?'}{urlencode(pairs)}"
+
+    @staticmethod
+    def make_key(url: str) -> str:
+        return hashlib.sha256(url.encode()).hexdigest()
+
+    def body_path(self, key: str) -> str:
+        return os.path.join(self.directory, 'bodies', key)
+
+    def ttl_for(self, url: str) -> float:
+        for pattern, ttl in self.ttls:
+            if pattern.search(url):
+                return ttl
+        return self.default_ttl
+
+    def lookup(self, url: str, params: Optional[Mapping[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Cached response for a request, with a 'fresh' flag, or None"""
+        full_url = self.full_url(url, params)
+        key = self.make_key(full_url)
+        row = self.db.execute(
+            "SELECT status, headers, etag, last_modified, stored_at FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if not row:
+            metrics.inc('scraper_cache_total', result='miss')
+            return None
+
+        try:
+            with open(self.body_path(key), 'rb') as f:
+                body = f.read()
+        except FileNotFoundError:
+            self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self.db.commit()
+            metrics.inc('scraper_cache_total', result='miss')
+            return None
+
+        status, headers, etag, last_modified, stored_at = row
+        fresh = self.offline or time.time() - stored_at < self.ttl_for(full_url)
+        self.db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        self.db.commit()
+        metrics.inc('scraper_cache_total', result='hit' if fresh else 'stale')
+
+        return {
+            'key': key,
+            'url': full_url,
+            'status': status,
+            'headers': json.loads(headers),
+            'body': body,
+            'etag': etag,
+            'last_modified': last_modified,
+            'fresh': fresh,
+        }
+
+    @staticmethod
+    def conditional_headers(entry: Optional[Dict[str, Any]]) -> Dict[str, str]:
+        """Validators to send when revalidating a stale entry"""
+        headers = {}
+        if entry and entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def refresh(self, entry: Dict[str, Any]):
+        """Mark an entry fresh again after a 304 Not Modified"""
+        now = time.time()
+        self.db.execute("UPDATE responses SET stored_at = ?, accessed_at = ? WHERE key = ?", (now, now, entry['key']))
+        self.db.commit()
+        metrics.inc('scraper_cache_total', result='revalidated')
+
+    def store(self, url: str, params: Optional[Mapping[str, Any]], status: int, headers: Mapping[str, str], body: Union[bytes, str]):
+        """Store a successful response"""
+        if status != 200:
+            return
+
+        if isinstance(body, str):
+            body = body.encode()
+        full_url = self.full_url(url, params)
+        key = self.make_key(full_url)
+        lowered = {name.lower(): value for name, value in headers.items()}
+        kept = {name: lowered[name] for name in KEPT_HEADERS if name in lowered}
+
+        tmp_path = f"{self.body_path(key)}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(body)
+        os.replace(tmp_path, self.body_path(key))
+
+        now = time.time()
+        self.db.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, full_url, status, json.dumps(kept), lowered.get('etag'), lowered.get('last-modified'), len(body), now, now)
+        )
+        self.db.commit()
+        self.evict()
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes"""
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        for key, size in self.db.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall():
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(self.body_path(key))
+            except FileNotFoundError:
+                pass
+            self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            metrics.inc('scraper_cache_evictions_total')
+        self.db.commit()
+
+    async def install(self, target, site_url: str, resource_types: Tuple[str, ...] = ('document', 'xhr', 'fetch')):
+        """Serve a Playwright page or context's same-site GET requests through the cache
+
+        Register this after any blocking policy: Playwright runs the most
+        recently registered route first, and requests the cache doesn't
+        handle fall back to the earlier handlers.
+        """
+        site_host = urlparse(site_url).hostname or ''
+
+        async def handle(route):
+            request = route.request
+            host = urlparse(request.url).hostname or ''
+            if request.method != 'GET' or request.resource_type not in resource_types or not host.endswith(site_host):
+                await route.fallback()
+                return
+
+            entry = self.lookup(request.url)
+            if entry and entry['fresh']:
+                await route.fulfill(status=entry['status'], headers=entry['headers'], body=entry['body'])
+                return
+            if self.offline:
+                await route.abort()
+                return
+
+            response = await route.fetch(headers={**request.headers, **self.conditional_headers(entry)})
+            if response.status == 304 and entry:
+                self.refresh(entry)
+                await route.fulfill(status=entry['status'], headers=entry['headers'], body=entry['body'])
+                return
+
+            body = await response.body()
+            self.store(request.url, None, response.status, response.headers, body)
+            await route.fulfill(response=response, body=body)
+
+        await target.route('**/*', handle)
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,277 @@
+import asyncio
+import hashlib
+import mimetypes
+import os
+import sqlite3
+import tempfile
+import time
+import logging
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import aiohttp
+
+from metrics import metrics
+from rate_limiter import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+
+# Extensions for the image types hosts actually serve; mimetypes has odd picks for some
+IMAGE_EXTENSIONS = {
+    'image/jpeg': '.jpg',
+    'image/png': '.png',
+    'image/webp': '.webp',
+    'image/gif': '.gif',
+    'image/avif': '.avif',
+}
+
+
+def content_key(digest: str, content_type: str, url: str = '') -> str:
+    """Storage path of an image: its SHA-256 fanned out over two directory levels"""
+    extension = IMAGE_EXTENSIONS.get(content_type) or mimetypes.guess_extension(content_type or '') \
+        or os.path.splitext(urlparse(url).path)[1].lower() or '.bin'
+    return f"{digest[:2]}/{digest[2:4]}/{digest}{extension}"
+
+
+class LocalImageStore:
+    def __init__(self, directory: str = 'public/mirror', public_base: str = '/mirror'):
+        """Images as files under a directory served at public_base (by default Next.js's public/)"""
+        self.directory = directory
+        self.public_base = public_base.rstrip('/')
+
+    def url(self, key: str) -> str:
+        return f"{self.public_base}/{key}"
+
+    def is_mirrored(self, url: str) -> bool:
+        return url.startswith(self.public_base + '/')
+
+    def save(self, key: str, data: bytes, content_type: str):
+        path = os.path.join(self.directory, key)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file first so readers never see a partial image. The
+        # name is unique so concurrent saves of the same bytes don't share it, and
+        # as the file is content-addressed whichever replace lands last is the same.
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+
+class SupabaseImageStore:
+    def __init__(self, supabase, bucket: str = 'content', prefix: str = 'mirror'):
+        """Images as objects in a public Supabase Storage bucket"""
+        self.bucket = supabase.storage.from_(bucket)
+        self.prefix = prefix.strip('/')
+        # get_public_url appends an empty query string
+        self.public_base = self.bucket.get_public_url(self.prefix).rstrip('?/')
+
+    def url(self, key: str) -> str:
+        return f"{self.public_base}/{key}"
+
+    def is_mirrored(self, url: str) -> bool:
+        return url.startswith(self.public_base + '/')
+
+    def save(self, key: str, data: bytes, content_type: str):
+        # Content-addressed, so objects never change and overwriting one is harmless
+        self.bucket.upload(f"{self.prefix}/{key}", data, {
+            'content-type': content_type,
+            'cache-control': '31536000',
+            'x-upsert': 'true',
+        })
+
+
+class ImageMirror:
+    def __init__(
+        self,
+        store,
+        index_path: str = '.image_mirror.sqlite',
+        concurrency: int = 16,
+        per_host: int = 4,
+        rate: float = 10.0,
+        max_retries: int = 3,
+        max_bytes: int = 20 * 1024 * 1024,
+    ):
+        """Downloads images into a content-addressed store
+
+        Every image is stored once under the hash of its bytes, however
+        many chapters or sources link to it. An SQLite index maps source
+        URLs to stored keys, so a rerun (or another chapter with the same
+        URL) skips the download, and records which keys the store already
+        holds, so identical bytes from different URLs are uploaded once.
+        At most `concurrency` downloads run at once, `per_host` of them
+        against the same host, paced per host by a RateLimiter.
+        """
+        self.store = store
+        self.concurrency = max(1, concurrency)
+        self.per_host = max(1, per_host)
+        self.rate_limiter = RateLimiter(rate=rate)
+        self.max_retries = max_retries
+        self.max_bytes = max_bytes
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        self.in_flight: Dict[str, asyncio.Task] = {}
+        # Saves in progress by key, as different URLs can carry the same bytes
+        self.saving: Dict[str, asyncio.Task] = {}
+
+        self.db = sqlite3.connect(index_path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS images (
+                url TEXT PRIMARY KEY,
+                key TEXT NOT NULL,
+                mirrored_at REAL NOT NULL
+            )
+        """)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS objects (
+                key TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                content_type TEXT NOT NULL
+            )
+        """)
+        # Last row id done per table, so a walk over the database can resume
+        self.db.execute("CREATE TABLE IF NOT EXISTS cursors (name TEXT PRIMARY KEY, after TEXT NOT NULL)")
+        self.db.commit()
+
+    async def __aenter__(self):
+        await self.initialize()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def initialize(self):
+        self.session = aiohttp.ClientSession(
+            headers={"User-Agent": USER_AGENT},
+            connector=aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.per_host),
+            timeout=aiohttp.ClientTimeout(total=120, sock_read=30)
+        )
+
+    async def close(self):
+        if self.session:
+            await self.session.close()
+            self.session = None
+        self.db.close()
+
+    def lookup(self, url: str) -> Optional[str]:
+        """Stored key of an already mirrored URL"""
+        row = self.db.execute("SELECT key FROM images WHERE url = ?", (url,)).fetchone()
+        return row[0] if row else None
+
+    def cursor(self, name: str) -> Optional[str]:
+        row = self.db.execute("SELECT after FROM cursors WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def set_cursor(self, name: str, after: Optional[str]):
+        if after is None:
+            self.db.execute("DELETE FROM cursors WHERE name = ?", (name,))
+        else:
+            self.db.execute("INSERT OR REPLACE INTO cursors (name, after) VALUES (?, ?)", (name, after))
+        self.db.commit()
+
+    async def download(self, url: str, referer: Optional[str]) -> Optional[Tuple[bytes, str]]:
+        """Image bytes and content type, retrying throttling and server errors"""
+        headers = {'Referer': referer} if referer else None
+        for attempt in range(self.max_retries + 1):
+            await self.rate_limiter.acquire(url)
+            try:
+                async with self.semaphore:
+                    with metrics.timer('scraper_request_seconds', scraper='image_mirror', endpoint='image'):
+                        async with self.session.get(url, headers=headers) as response:
+                            status, response_headers = response.status, response.headers
+                            content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+                            if status == 200 and response.content_length and response.content_length > self.max_bytes:
+                                logger.warning(f"Skipping {url}: {response.content_length} bytes")
+                                return None
+                            data = await response.read() if status == 200 else b''
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.warning(f"Error downloading {url} (attempt {attempt + 1}): {e}")
+                await asyncio.sleep(min(2 ** attempt, 30))
+                continue
+
+            metrics.inc('scraper_requests_total', scraper='image_mirror', endpoint='image', status=str(status))
+            retry_delay = self.rate_limiter.update_from_response(url, status, response_headers, attempt)
+            if retry_delay is not None or status >= 500:
+                await asyncio.sleep(retry_delay if retry_delay is not None else min(2 ** attempt, 30))
+                continue
+            if status != 200:
+                logger.warning(f"Error downloading {url}: status {status}")
+                return None
+
+            # Hotlink protection often answers 200 with an HTML page instead of the image
+            if not content_type.startswith('image/'):
+                logger.warning(f"Skipping {url}: got {content_type or 'no content type'} instead of an image")
+                return None
+            metrics.inc('scraper_bytes_downloaded_total', len(data), scraper='image_mirror', endpoint='image')
+            return data, content_type
+
+        logger.error(f"Giving up on {url} after {self.max_retries + 1} attempts")
+        return None
+
+    async def _mirror(self, url: str, referer: Optional[str]) -> Optional[str]:
+        key = self.lookup(url)
+        if key:
+            metrics.inc('scraper_images_total', scraper='image_mirror', result='indexed')
+            return self.store.url(key)
+
+        downloaded = await self.download(url, referer)
+        if not downloaded:
+            metrics.inc('scraper_images_total', scraper='image_mirror', result='failed')
+            return None
+        data, content_type = downloaded
+
+        key = content_key(hashlib.sha256(data).hexdigest(), content_type, url)
+        stored = self.db.execute("SELECT 1 FROM objects WHERE key = ?", (key,)).fetchone()
+        if stored:
+            metrics.inc('scraper_images_total', scraper='image_mirror', result='deduplicated')
+        else:
+            task = self.saving.get(key)
+            saved_here = task is None
+            if saved_here:
+                task = asyncio.ensure_future(self._save(key, data, content_type))
+                self.saving[key] = task
+                task.add_done_callback(lambda _: self.saving.pop(key, None))
+            try:
+                await asyncio.shield(task)
+            except Exception as e:
+                logger.error(f"Error storing {url} as {key}: {e}")
+                metrics.inc('scraper_images_total', scraper='image_mirror', result='failed')
+                return None
+            self.db.execute("INSERT OR IGNORE INTO objects (key, size, content_type) VALUES (?, ?, ?)", (key, len(data), content_type))
+            metrics.inc('scraper_images_total', scraper='image_mirror', result='stored' if saved_here else 'deduplicated')
+
+        self.db.execute("INSERT OR REPLACE INTO images (url, key, mirrored_at) VALUES (?, ?, ?)", (url, key, time.time()))
+        self.db.commit()
+        return self.store.url(key)
+
+    async def _save(self, key: str, data: bytes, content_type: str):
+        with metrics.timer('scraper_storage_seconds', scraper='image_mirror'):
+            await asyncio.to_thread(self.store.save, key, data, content_type)
+
+    async def mirror(self, url: str, referer: Optional[str] = None) -> Optional[str]:
+        """Mirrored URL of an image, or None if it couldn't be mirrored
+
+        Concurrent calls for the same URL share one download.
+        """
+        if not url or self.store.is_mirrored(url):
+            return url
+        task = self.in_flight.get(url)
+        if task is None:
+            task = asyncio.ensure_future(self._mirror(url, referer))
+            self.in_flight[url] = task
+            task.add_done_callback(lambda _: self.in_flight.pop(url, None))
+        return await asyncio.shield(task)
+
+    async def mirror_all(self, urls: List[str], referer: Optional[str] = None) -> List[str]:
+        """Mirrored URLs in the same order, keeping the original URL for any that failed"""
+        mirrored = await asyncio.gather(*(self.mirror(url, referer) for url in urls))
+        return [new or old for old, new in zip(urls, mirrored)]
@@ -0,0 +1,123 @@
+import multiprocessing
+import os
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from PIL import Image
+
+try:
+    import pillow_avif  # noqa: F401 - registers the AVIF encoder with Pillow
+    AVIF_AVAILABLE = True
+except ImportError:  # optional, renditions are then WebP only
+    AVIF_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Rendition widths per kind of image; larger ones serve high-density screens
+WIDTHS: Dict[str, Tuple[int, ...]] = {
+    'cover': (160, 320, 640),
+    'page': (480, 960),
+}
+
+DEFAULT_FORMATS: Tuple[str, ...] = ('webp', 'avif') if AVIF_AVAILABLE else ('webp',)
+
+# Encoder settings per format; AVIF at this speed is several times slower than WebP
+SAVE_OPTIONS: Dict[str, Dict[str, Any]] = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'avif': {'format': 'AVIF', 'quality': 60, 'speed': 8},
+}
+
+# Largest dimension each encoder accepts; long webtoon strips can exceed WebP's
+MAX_DIMENSION = {'webp': 16383, 'avif': 65536}
+
+
+def rendition_key(digest: str, width: int, image_format: str) -> str:
+    """Storage path of a rendition, next to the original's hash fan-out"""
+    return f"renditions/{digest[:2]}/{digest[2:4]}/{digest}-{width}.{image_format}"
+
+
+def render_image(
+    source_path: str,
+    digest: str,
+    output_directory: str,
+    widths: Sequence[int],
+    formats: Sequence[str] = DEFAULT_FORMATS,
+) -> List[Dict[str, Any]]:
+    """Write resized renditions of one image and describe them
+
+    Runs in the worker processes. The source is decoded straight from
+    disk, JPEGs at the smallest DCT scale that still covers the largest
+    width, and each width is resized from the previous, larger one.
+    Images are never upscaled: widths beyond the image's own are
+    replaced by a single rendition at its own width.
+    """
+    renditions = []
+    with Image.open(source_path) as image:
+        target_widths = {width if width < image.width else image.width for width in widths}
+        target_widths = sorted(target_widths, reverse=True)
+        image.draft('RGB', (target_widths[0], max(1, image.height * target_widths[0] // image.width)))
+        current = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info else 'RGB')
+
+    for width in target_widths:
+        height = max(1, round(current.height * width / current.width))
+        if current.width != width:
+            current = current.resize((width, height), Image.LANCZOS)
+
+        for image_format in formats:
+            if max(width, height) > MAX_DIMENSION[image_format]:
+                continue
+            key = rendition_key(digest, width, image_format)
+            path = os.path.join(output_directory, key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temporary file first so readers never see a partial image
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            current.save(temp_path, **SAVE_OPTIONS[image_format])
+            os.replace(temp_path, path)
+            renditions.append({
+                'format': image_format,
+                'width': width,
+                'height': height,
+                'key': key,
+                'bytes': os.path.getsize(path),
+            })
+    return renditions
+
+
+def _render_job(job: Tuple[str, str, str, Sequence[int], Sequence[str]]) -> Tuple[str, Optional[List[Dict[str, Any]]]]:
+    source_path, digest = job[0], job[1]
+    try:
+        return digest, render_image(*job)
+    except Exception as e:
+        # Truncated or undecodable downloads shouldn't take the batch down
+        logger.error(f"Error rendering {source_path}: {e}")
+        return digest, None
+
+
+class RenditionPool:
+    def __init__(self, processes: Optional[int] = None, formats: Sequence[str] = DEFAULT_FORMATS):
+        """Process pool rendering images on every core
+
+        Decoding and encoding are CPU bound, so they run in separate
+        processes instead of threads; jobs only carry file paths, the
+        workers read the sources from disk themselves.
+        """
+        self.processes = processes or os.cpu_count() or 1
+        self.formats = tuple(format for format in formats if format != 'avif' or AVIF_AVAILABLE)
+        if len(self.formats) != len(formats):
+            logger.warning("pillow-avif-plugin is not installed, skipping AVIF renditions")
+        self.executor = ProcessPoolExecutor(self.processes, mp_context=multiprocessing.get_context('spawn'))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def render(self, jobs: Iterable[Tuple[str, str, str, Sequence[int]]]) -> Iterator[Tuple[str, Optional[List[Dict[str, Any]]]]]:
+        """(digest, renditions or None on failure) for (source path, digest, output directory, widths) jobs, in order"""
+        jobs = [(source_path, digest, output_directory, widths, self.formats) for source_path, digest, output_directory, widths in jobs]
+        return self.executor.map(_render_job, jobs, chunksize=max(1, len(jobs) // (self.processes * 4)))
+
+    def close(self):
+        self.executor.shutdown()
@@ -0,0 +1,193 @@
+import asyncio
+import re
+from typing import Dict, List, Optional
+from urllib.parse import urljoin
+
+import aiohttp
+from bs4 import BeautifulSoup
+
+from chapter_order import order_chapters
+from manhwa_scraper import ManhwaScraper
+from metrics import metrics
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+
+# Markers of a bot challenge page instead of real content
+CHALLENGE_MARKERS = (
+    'cf-browser-verification',
+    'challenge-form',
+    'cf-challenge-running',
+    'cf_captcha_container',
+    '<title>Just a moment...</title>',
+)
+
+NUMBER_PATTERN = re.compile(r'[-+]?\d*\.?\d+')
+
+
+def parse_float(text: Optional[str]) -> Optional[float]:
+    """Leading number of a string, like JavaScript's parseFloat (None instead of NaN)"""
+    if not text:
+        return None
+    match = NUMBER_PATTERN.match(text.strip())
+    return float(match.group()) if match else None
+
+
+class HttpManhwaScraper(ManhwaScraper):
+    def __init__(self, http_concurrency: int = 8, **kwargs):
+        """ManhwaScraper that reads the server-rendered HTML with aiohttp + lxml
+
+        The browser is only started the first time a page can't be parsed
+        statically (nothing found, or a challenge page was served), and
+        the Playwright implementation is then used for that call.
+        """
+        super().__init__(**kwargs)
+        self.http_concurrency = max(1, http_concurrency)
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.http_semaphore = asyncio.Semaphore(self.http_concurrency)
+        self.browser_lock = asyncio.Lock()
+
+    async def initialize(self):
+        """Create the HTTP session; the browser is launched lazily"""
+        self.session = aiohttp.ClientSession(
+            headers={"User-Agent": USER_AGENT},
+            connector=aiohttp.TCPConnector(limit_per_host=self.http_concurrency),
+            timeout=aiohttp.ClientTimeout(total=60)
+        )
+
+    async def ensure_browser(self):
+        """Start the Playwright browser the first time a fallback needs it"""
+        async with self.browser_lock:
+            if not self.context:
+                await super().initialize()
+
+    async def close(self):
+        """Close the HTTP session and the browser if it was started"""
+        if self.session:
+            await self.session.close()
+            self.session = None
+        await super().close()
+
+    async def fetch_html(self, url: str, endpoint: str) -> Optional[BeautifulSoup]:
+        """Fetch and parse a page, or None if it failed or is a challenge page"""
+        cached = self.cache.lookup(url) if self.cache else None
+        if cached and cached['fresh']:
+            return BeautifulSoup(cached['body'], 'lxml')
+        if self.cache and self.cache.offline:
+            return None
+
+        try:
+            async with self.http_semaphore:
+                with metrics.timer('scraper_request_seconds', scraper='manhwa_http', endpoint=endpoint):
+                    async with self.session.get(url, headers=self.cache.conditional_headers(cached) if self.cache else None) as response:
+                        html = await response.text()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"HTTP error fetching {url}: {e}")
+            return None
+
+        if response.status == 304 and cached:
+            self.cache.refresh(cached)
+            return BeautifulSoup(cached['body'], 'lxml')
+
+        metrics.inc('scraper_requests_total', scraper='manhwa_http', endpoint=endpoint, status=str(response.status))
+        metrics.inc('scraper_bytes_downloaded_total', len(html), scraper='manhwa_http', endpoint=endpoint)
+
+        if response.status != 200 or any(marker in html for marker in CHALLENGE_MARKERS):
+            metrics.inc('scraper_challenges_total', scraper='manhwa_http', endpoint=endpoint)
+            print(f"Static fetch of {url} got status {response.status} or a challenge page")
+            return None
+
+        if self.cache:
+            self.cache.store(url, None, response.status, response.headers, html)
+        return BeautifulSoup(html, 'lxml')
+
+    def fallback(self, endpoint: str):
+        metrics.inc('scraper_browser_fallbacks_total', scraper='manhwa_http', endpoint=endpoint)
+        print(f"Falling back to the browser for {endpoint}")
+
+    async def get_manhwa_list(self, page_num: int = 1) -> List[Dict]:
+        """Get list of manhwa from the archive page"""
+        url = f"{self.base_url}/series/page/{page_num}/"
+        soup = await self.fetch_html(url, 'series_list')
+
+        manhwa_list = []
+        for card in soup.select('.bsx') if soup else []:
+            link_el = card.select_one('a')
+            title_el = card.select_one('.tt')
+            cover_el = card.select_one('img')
+            rating_el = card.select_one('.rating')
+
+            if not link_el or not title_el:
+                continue
+
+            href = link_el.get('href')
+            slug = href.split('/series/')[1].rstrip('/') if href and '/series/' in href else ''
+
+            manhwa_list.append({
+                'title': title_el.get_text().strip(),
+                'url': href,
+                'slug': slug,
+                'rating': parse_float(rating_el.get_text()) if rating_el else 0.0,
+                'is_colored': card.select_one('.colored') is not None,
+                'cover_url': cover_el.get('src') if cover_el else None
+            })
+
+        if not manhwa_list:
+            self.fallback('series_list')
+            await self.ensure_browser()
+            return await super().get_manhwa_list(page_num)
+
+        print(f"Found {len(manhwa_list)} manhwa on page {page_num}")
+        return manhwa_list
+
+    async def get_chapter_list(self, manhwa_url: str) -> List[Dict]:
+        """Get list of chapters for a manhwa"""
+        soup = await self.fetch_html(urljoin(self.base_url, manhwa_url), 'chapter_list')
+
+        chapters = []
+        if soup and soup.select_one('.chbox'):
+            for item in soup.select('li[data-num]'):
+                link_el = item.select_one('a')
+                number_el = item.select_one('.chapternum')
+                date_el = item.select_one('.chapter-date')
+
+                if not link_el or not number_el:
+                    continue
+
+                chapters.append({
+                    'title': number_el.get_text().strip(),
+                    'url': link_el.get('href'),
+                    'chapter_number': parse_float(item.get('data-num')),
+                    'date': date_el.get_text().strip() if date_el else None
+                })
+
+        if not chapters:
+            self.fallback('chapter_list')
+            await self.ensure_browser()
+            return await super().get_chapter_list(manhwa_url)
+
+        chapters = order_chapters(chapters)
+        print(f"Found {len(chapters)} chapters")
+        return chapters
+
+    async def get_chapter_images(self, chapter_url: str) -> List[str]:
+        """Get list of image URLs for a chapter"""
+        soup = await self.fetch_html(urljoin(self.base_url, chapter_url), 'chapter_images')
+
+        images = []
+        for img in soup.select('.reading-content img') if soup else []:
+            src = img.get('src') or img.get('data-src')
+            if src and 'loading.gif' not in src:
+                images.append(src.strip())
+
+        if not images:
+            self.fallback('chapter_images')
+            await self.ensure_browser()
+            return await super().get_chapter_images(chapter_url)
+
+        print(f"Found {len(images)} images")
+        return images
+
+    async def get_manhwa_details(self, url: str) -> Dict:
+        """Get detailed information about a specific manhwa (browser only)"""
+        await self.ensure_browser()
+        return await super().get_manhwa_details(url)
@@ -1,7 +1,11 @@
+import argparse
 import asyncio
 import os
+from typing import Dict, List, Optional, Set
 from supabase import create_client, Client
-from manhwa_scraper import ManhwaScraper
+from manhwa_http_scraper import HttpManhwaScraper
+from image_mirror import ImageMirror
+from metrics import metrics
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -16,69 +20,174 @@ if not supabase_url or not supabase_key:
 
 supabase: Client = create_client(supabase_url, supabase_key)
 
-async def import_manhwa(num_pages: int = 1):
-    """Import manhwa data into Supabase"""
-    scraper = ManhwaScraper()
+def insert_batches(table: str, rows: List[Dict], batch_size: int) -> int:
+    """Insert rows in batches, retrying a failed batch one row at a time"""
+    inserted = 0
+    for i in range(0, len(rows), batch_size):
+        batch = rows[i:i + batch_size]
+        try:
+            with metrics.timer('scraper_db_seconds', scraper='manhwa', operation=f'insert_{table}'):
+                supabase.table(table).insert(batch).execute()
+            inserted += len(batch)
+            continue
+        except Exception as e:
+            print(f"Error inserting batch of {len(batch)} {table}, retrying one by one: {e}")
+
+        for row in batch:
+            try:
+                supabase.table(table).insert(row).execute()
+                inserted += 1
+            except Exception as e:
+                print(f"Error inserting {table} row {row.get('title')}: {e}")
+    return inserted
+
+def find_manhwa_id(slug: str) -> Optional[str]:
+    """Id of an already imported manhwa, if there is one"""
+    result = supabase.table('manhwa').select('id').eq('slug', slug).limit(1).execute()
+    return result.data[0]['id'] if result.data else None
+
+def load_chapter_urls(manhwa_id: str, page_size: int = 1000) -> Set[str]:
+    """URLs of the chapters already stored for a manhwa"""
+    urls: Set[str] = set()
+    offset = 0
+    while True:
+        # A stable order keeps the pages from overlapping or skipping rows
+        result = supabase.table('chapters').select('url').eq('manhwa_id', manhwa_id) \
+            .order('id').range(offset, offset + page_size - 1).execute()
+        urls.update(row['url'] for row in result.data)
+        if len(result.data) < page_size:
+            return urls
+        offset += page_size
+
+async def fetch_chapter_pages(scraper: HttpManhwaScraper, chapters: List[Dict], semaphore: asyncio.Semaphore, mirror: Optional[ImageMirror] = None) -> List[List[str]]:
+    """Get the images of all chapters concurrently, bounded by the shared semaphore
+
+    With a mirror the images are downloaded into its store and the
+    mirrored URLs returned (the original ones for any that failed).
+    A chapter that fails gets no images rather than failing the others.
+    """
+    async def fetch(chapter: Dict) -> List[str]:
+        try:
+            async with semaphore:
+                images = await scraper.get_chapter_images(chapter['url'])
+            return await mirror.mirror_all(images, referer=chapter['url']) if mirror else images
+        except Exception as e:
+            print(f"Error fetching images of chapter {chapter['title']}: {e}")
+            return []
+
+    return await asyncio.gather(*(fetch(chapter) for chapter in chapters))
+
+async def import_series(scraper: HttpManhwaScraper, manhwa: Dict, semaphore: asyncio.Semaphore, batch_size: int, mirror: Optional[ImageMirror] = None) -> bool:
+    """Import one manhwa and all of its chapters"""
+    print(f"Processing {manhwa['title']}...")
+    
+    # Get chapters
+    chapters = await scraper.get_chapter_list(manhwa['url'])
+    
+    # Insert manhwa unless it was imported before
+    try:
+        manhwa_id = await asyncio.to_thread(find_manhwa_id, manhwa['slug'])
+        if manhwa_id:
+            existing_urls = await asyncio.to_thread(load_chapter_urls, manhwa_id)
+            print(f"Manhwa {manhwa['title']} already imported with {len(existing_urls)} chapters")
+        else:
+            cover_url = manhwa['cover_url']
+            if mirror and cover_url:
+                cover_url = await mirror.mirror(cover_url, referer=manhwa['url']) or cover_url
+            result = await asyncio.to_thread(
+                lambda: supabase.table('manhwa').insert({
+                    'title': manhwa['title'],
+                    'slug': manhwa['slug'],
+                    'rating': manhwa['rating'],
+                    'genres': manhwa.get('genres', []),
+                    'cover_url': cover_url,
+                    'source': 'zeroscans'
+                }).execute()
+            )
+            manhwa_id = result.data[0]['id']
+            existing_urls = set()
+            print(f"Inserted manhwa {manhwa['title']} with ID {manhwa_id}")
+    except Exception as e:
+        print(f"Error inserting manhwa {manhwa['title']}: {e}")
+        return False
+    
+    # Only chapters that aren't stored yet need their images scraped
+    chapters = [chapter for chapter in chapters if chapter['url'] not in existing_urls]
+    if not chapters:
+        print(f"No new chapters for {manhwa['title']}")
+        return True
+    
+    # Get chapter images in parallel, then insert the chapters in bulk.
+    # Chapters without images are left out so the next run tries them again.
+    pages = await fetch_chapter_pages(scraper, chapters, semaphore, mirror)
+    rows = [
+        {
+            'manhwa_id': manhwa_id,
+            'title': chapter['title'],
+            'chapter_number': chapter['chapter_number'],
+            'sort_key': chapter['sort_key'],
+            'date': chapter['date'],
+            'url': chapter['url'],
+            'pages': images
+        }
+        for chapter, images in zip(chapters, pages)
+        if images
+    ]
+    inserted = await asyncio.to_thread(insert_batches, 'chapters', rows, batch_size) if rows else 0
+    
+    print(f"Successfully imported {manhwa['title']} ({inserted}/{len(chapters)} new chapters)")
+    return True
+
+async def import_manhwa(num_pages: int = 1, concurrency: int = 8, batch_size: int = 50, base_url: Optional[str] = None, mirror: Optional[ImageMirror] = None):
+    """Import manhwa data into Supabase
+
+    List pages are processed concurrently, and at most `concurrency`
+    chapter image fetches run at once across all of them. base_url
+    overrides the site, e.g. to point the import at a replay server.
+    With a mirror (initialized by the caller) covers and pages are
+    stored as mirrored URLs instead of hot-linking the source.
+    """
+    scraper = HttpManhwaScraper(http_concurrency=concurrency, concurrency=min(concurrency, 4))
+    if base_url:
+        scraper.base_url = base_url
     await scraper.initialize()
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def import_page(page: int) -> int:
+        print(f"Processing page {page}...")
+        manhwa_list = await scraper.get_manhwa_list(page)
+        
+        imported = 0
+        for manhwa in manhwa_list:
+            try:
+                if await import_series(scraper, manhwa, semaphore, batch_size, mirror):
+                    imported += 1
+            except Exception as e:
+                print(f"Error importing {manhwa['title']}: {e}")
+        
+        print(f"Imported {imported} manhwa from page {page}")
+        return imported
     
     try:
-        total_imported = 0
-        for page in range(1, num_pages + 1):
-            print(f"Processing page {page}...")
-            manhwa_list = await scraper.get_manhwa_list(page)
-            
-            for manhwa in manhwa_list:
-                print(f"Processing {manhwa['title']}...")
-                
-                # Get chapters
-                chapters = await scraper.get_chapter_list(manhwa['url'])
-                
-                # Insert manhwa
-                try:
-                    result = supabase.table('manhwa').insert({
-                        'title': manhwa['title'],
-                        'slug': manhwa['slug'],
-                        'rating': manhwa['rating'],
-                        'genres': manhwa['genres'],
-                        'cover_url': manhwa['cover_url'],
-                        'source': 'zeroscans'
-                    }).execute()
-                    
-                    manhwa_id = result.data[0]['id']
-                    print(f"Inserted manhwa {manhwa['title']} with ID {manhwa_id}")
-                    
-                    # Insert chapters
-                    for chapter in chapters:
-                        try:
-                            # Get chapter images
-                            images = await scraper.get_chapter_images(chapter['url'])
-                            
-                            # Insert chapter
-                            supabase.table('chapters').insert({
-                                'manhwa_id': manhwa_id,
-                                'title': chapter['title'],
-                                'chapter_number': chapter['chapter_number'],
-                                'date': chapter['date'],
-                                'url': chapter['url'],
-                                'pages': images
-                            }).execute()
-                            print(f"Inserted chapter {chapter['title']}")
-                            
-                        except Exception as e:
-                            print(f"Error inserting chapter {chapter['title']}: {e}")
-                            continue
-                    
-                    total_imported += 1
-                    print(f"Successfully imported {manhwa['title']}")
-                    
-                except Exception as e:
-                    print(f"Error inserting manhwa {manhwa['title']}: {e}")
-                    continue
-                
-            print(f"Imported {total_imported} manhwa from page {page}")
-            
+        results = await asyncio.gather(*(import_page(page) for page in range(1, num_pages + 1)))
+        print(f"Imported {sum(results)} manhwa in total")
     finally:
         await scraper.close()
 
+def parse_args() -> argparse.Namespace:
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Import manhwa and their chapters into Supabase")
+    parser.add_argument('--pages', type=int, default=1, help="Number of series list pages to import")
+    parser.add_argument('--concurrency', type=int, default=8, help="Chapter image fetches running at once")
+    parser.add_argument('--batch-size', type=int, default=50, help="Chapters per insert request")
+    parser.add_argument('--metrics-port', type=int, help="Serve Prometheus metrics on this port")
+    parser.add_argument('--metrics-file', help="Periodically write a JSON metrics snapshot to this file")
+    return parser.parse_args()
+
+async def main():
+    args = parse_args()
+    async with metrics.exporting(args.metrics_port, args.metrics_file):
+        await import_manhwa(args.pages, concurrency=args.concurrency, batch_size=args.batch_size)
+
 if __name__ == "__main__":
-    asyncio.run(import_manhwa(1)) 
\ No newline at end of file
+    asyncio.run(main()) 
\ No newline at end of file
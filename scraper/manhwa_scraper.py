@@ -1,98 +1,177 @@
 import asyncio
 import json
 import os
-from typing import Dict, List, Optional
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional
 from datetime import datetime
 import re
 from urllib.parse import urljoin
-from playwright.async_api import async_playwright, Page, Browser, Playwright, TimeoutError
+from playwright.async_api import async_playwright, Page, Browser, BrowserContext, Playwright, Response, TimeoutError
 
-class ManhwaScraper:
+from browser_launcher import open_browser_context, close_browser_context
+from chapter_order import order_chapters
+from http_cache import ResponseCache
+from metrics import metrics
+from resource_policy import ResourcePolicy
+
+class PagePool:
     def __init__(self):
+        """Pool of browser pages handed out one caller at a time"""
+        self.pages: List[Page] = []
+        self.available: asyncio.Queue = asyncio.Queue()
+
+    def add(self, page: Page):
+        self.pages.append(page)
+        self.available.put_nowait(page)
+
+    @asynccontextmanager
+    async def page(self) -> AsyncIterator[Page]:
+        """Check out a page, waiting if all of them are busy, and return it afterwards"""
+        page = await self.available.get()
+        try:
+            yield page
+        finally:
+            self.available.put_nowait(page)
+
+    async def close(self):
+        for page in self.pages:
+            await page.close()
+        self.pages = []
+        self.available = asyncio.Queue()
+
+
+class ManhwaScraper:
+    def __init__(
+        self,
+        concurrency: int = 4,
+        resource_policy: Optional[ResourcePolicy] = None,
+        headless: bool = True,
+        user_data_dir: Optional[str] = None,
+        cdp_url: Optional[str] = None,
+        cache: Optional[ResponseCache] = None,
+    ):
+        """concurrency is the number of browser tabs used for parallel navigation,
+        resource_policy decides which requests those tabs abort (images, fonts,
+        media and third-party scripts by default).
+
+        user_data_dir keeps the browser profile (and its cookies) between runs,
+        cdp_url attaches to an already running browser instead of launching one.
+        cache serves same-site documents and XHRs from an on-disk ResponseCache.
+        """
         self.base_url = "https://madarascans.com"
+        self.concurrency = max(1, concurrency)
+        self.resource_policy = resource_policy or ResourcePolicy()
+        self.headless = headless
+        self.user_data_dir = user_data_dir
+        self.cdp_url = cdp_url
+        self.cache = cache
         self.browser: Optional[Browser] = None
-        self.page: Optional[Page] = None
+        self.context: Optional[BrowserContext] = None
+        self.page_pool = PagePool()
         self.playwright: Optional[Playwright] = None
 
     async def initialize(self):
         """Initialize Playwright browser"""
         print("Initializing browser...")
         self.playwright = await async_playwright().start()
-        self.browser = await self.playwright.chromium.launch(
-            headless=False,  # Show the browser
-            args=['--no-sandbox', '--disable-setuid-sandbox']
+        self.browser, self.context = await open_browser_context(
+            self.playwright,
+            headless=self.headless,
+            user_data_dir=self.user_data_dir,
+            cdp_url=self.cdp_url,
+            args=['--no-sandbox', '--disable-setuid-sandbox'],
+            context_options={
+                "viewport": {"width": 1920, "height": 1080},
+                # Set a realistic user agent
+                "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+            }
         )
-        self.page = await self.browser.new_page()
-        await self.page.set_viewport_size({"width": 1920, "height": 1080})
+        await self.resource_policy.install(self.context, self.base_url, 'manhwa')
+        if self.cache:
+            # Registered last so it runs before the blocking policy
+            await self.cache.install(self.context, self.base_url)
         
-        # Set a realistic user agent
-        await self.page.set_extra_http_headers({
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        })
+        for _ in range(self.concurrency):
+            self.page_pool.add(await self.context.new_page())
         
-        print("Waiting for initial setup (5 seconds for manual intervention if needed)...")
-        await asyncio.sleep(5)  # Wait for manual intervention if needed
+        if not self.headless and not self.cdp_url:
+            print("Waiting for initial setup (5 seconds for manual intervention if needed)...")
+            await asyncio.sleep(5)  # Wait for manual intervention if needed
 
     async def close(self):
         """Close browser and playwright"""
-        if self.browser:
-            await self.browser.close()
+        await self.page_pool.close()
+        await close_browser_context(self.browser, self.context, attached=bool(self.cdp_url))
         if self.playwright:
             await self.playwright.stop()
 
-    async def wait_for_load(self, selector: str, timeout: int = 30000) -> bool:
+    async def wait_for_load(self, page: Page, selector: str, timeout: int = 30000) -> bool:
         """Wait for an element to load with timeout handling"""
         try:
-            await self.page.wait_for_selector(selector, timeout=timeout)
+            # Images are usually blocked, so the element only has to be in the DOM
+            await page.wait_for_selector(selector, timeout=timeout, state="attached")
             return True
         except TimeoutError:
+            metrics.inc('scraper_timeouts_total', scraper='manhwa')
             print(f"Timeout waiting for selector: {selector}")
             return False
 
+    async def navigate(self, page: Page, url: str, endpoint: str) -> Optional[Response]:
+        """Navigate to a URL, recording latency, status and transfer size"""
+        with metrics.timer('scraper_request_seconds', scraper='manhwa', endpoint=endpoint):
+            response = await page.goto(url, wait_until="domcontentloaded", timeout=60000)
+
+        status = str(response.status) if response else 'none'
+        metrics.inc('scraper_requests_total', scraper='manhwa', endpoint=endpoint, status=status)
+        content_length = response.headers.get('content-length') if response else None
+        if content_length and content_length.isdigit():
+            metrics.inc('scraper_bytes_downloaded_total', int(content_length), scraper='manhwa', endpoint=endpoint)
+        return response
+
     async def get_manhwa_list(self, page_num: int = 1) -> List[Dict]:
         """Get list of manhwa from the archive page"""
         print(f"Getting manhwa list from page {page_num}")
         url = f"{self.base_url}/series/page/{page_num}/"
         
         try:
-            await self.page.goto(url, wait_until="networkidle", timeout=60000)
-            await asyncio.sleep(2)  # Give JavaScript time to execute
-            
-            # Wait for the manhwa cards to load
-            if not await self.wait_for_load(".bsx"):
-                print("No manhwa cards found")
-                return []
-            
-            # Extract manhwa data
-            manhwa_list = await self.page.evaluate("""
-                () => {
-                    const cards = document.querySelectorAll('.bsx');
-                    return Array.from(cards).map(card => {
-                        const linkEl = card.querySelector('a');
-                        const titleEl = card.querySelector('.tt');
-                        const coverEl = card.querySelector('img');
-                        const ratingEl = card.querySelector('.rating');
-                        const colorEl = card.querySelector('.colored');
+            async with self.page_pool.page() as page:
+                await self.navigate(page, url, 'series_list')
+            
+                # Wait for the manhwa cards to load
+                if not await self.wait_for_load(page, ".bsx"):
+                    print("No manhwa cards found")
+                    return []
+            
+                # Extract manhwa data
+                manhwa_list = await page.evaluate("""
+                    () => {
+                        const cards = document.querySelectorAll('.bsx');
+                        return Array.from(cards).map(card => {
+                            const linkEl = card.querySelector('a');
+                            const titleEl = card.querySelector('.tt');
+                            const coverEl = card.querySelector('img');
+                            const ratingEl = card.querySelector('.rating');
+                            const colorEl = card.querySelector('.colored');
                         
-                        if (!linkEl || !titleEl) return null;
+                            if (!linkEl || !titleEl) return null;
                         
-                        const href = linkEl.getAttribute('href');
-                        const slug = href ? href.split('/series/')[1]?.replace(/\\/$/, '') : '';
+                            const href = linkEl.getAttribute('href');
+                            const slug = href ? href.split('/series/')[1]?.replace(/\\/$/, '') : '';
                         
-                        return {
-                            title: titleEl.textContent.trim(),
-                            url: href,
-                            slug: slug,
-                            rating: ratingEl ? parseFloat(ratingEl.textContent) : 0.0,
-                            is_colored: !!colorEl,
-                            cover_url: coverEl ? coverEl.getAttribute('src') : null
-                        };
-                    }).filter(Boolean);
-                }
-            """)
+                            return {
+                                title: titleEl.textContent.trim(),
+                                url: href,
+                                slug: slug,
+                                rating: ratingEl ? parseFloat(ratingEl.textContent) : 0.0,
+                                is_colored: !!colorEl,
+                                cover_url: coverEl ? coverEl.getAttribute('src') : null
+                            };
+                        }).filter(Boolean);
+                    }
+                """)
             
-            print(f"Found {len(manhwa_list)} manhwa on page {page_num}")
-            return manhwa_list
+                print(f"Found {len(manhwa_list)} manhwa on page {page_num}")
+                return manhwa_list
             
         except Exception as e:
             print(f"Error getting manhwa list: {e}")
@@ -104,39 +183,40 @@ class ManhwaScraper:
         full_url = urljoin(self.base_url, manhwa_url)
         
         try:
-            await self.page.goto(full_url, wait_until="networkidle", timeout=60000)
-            await asyncio.sleep(2)  # Give JavaScript time to execute
-            
-            # Wait for the chapter list to load
-            if not await self.wait_for_load(".chbox"):
-                print("No chapter list found")
-                return []
-            
-            # Extract chapter data
-            chapters = await self.page.evaluate("""
-                () => {
-                    const items = document.querySelectorAll('li[data-num]');
-                    return Array.from(items).map(item => {
-                        const linkEl = item.querySelector('a');
-                        const numberEl = item.querySelector('.chapternum');
-                        const dateEl = item.querySelector('.chapter-date');
+            async with self.page_pool.page() as page:
+                await self.navigate(page, full_url, 'chapter_list')
+            
+                # Wait for the chapter list to load
+                if not await self.wait_for_load(page, ".chbox"):
+                    print("No chapter list found")
+                    return []
+            
+                # Extract chapter data
+                chapters = await page.evaluate("""
+                    () => {
+                        const items = document.querySelectorAll('li[data-num]');
+                        return Array.from(items).map(item => {
+                            const linkEl = item.querySelector('a');
+                            const numberEl = item.querySelector('.chapternum');
+                            const dateEl = item.querySelector('.chapter-date');
                         
-                        if (!linkEl || !numberEl) return null;
+                            if (!linkEl || !numberEl) return null;
                         
-                        const chapterNumber = parseFloat(item.getAttribute('data-num'));
+                            const chapterNumber = parseFloat(item.getAttribute('data-num'));
                         
-                        return {
-                            title: numberEl.textContent.trim(),
-                            url: linkEl.getAttribute('href'),
-                            chapter_number: chapterNumber,
-                            date: dateEl ? dateEl.textContent.trim() : null
-                        };
-                    }).filter(Boolean).sort((a, b) => b.chapter_number - a.chapter_number);
-                }
-            """)
+                            return {
+                                title: numberEl.textContent.trim(),
+                                url: linkEl.getAttribute('href'),
+                                chapter_number: chapterNumber,
+                                date: dateEl ? dateEl.textContent.trim() : null
+                            };
+                        }).filter(Boolean);
+                    }
+                """)
+                chapters = order_chapters(chapters)
             
-            print(f"Found {len(chapters)} chapters")
-            return chapters
+                print(f"Found {len(chapters)} chapters")
+                return chapters
             
         except Exception as e:
             print(f"Error getting chapter list: {e}")
@@ -148,65 +228,69 @@ class ManhwaScraper:
         full_url = urljoin(self.base_url, chapter_url)
         
         try:
-            await self.page.goto(full_url, wait_until="networkidle", timeout=60000)
-            await asyncio.sleep(2)  # Give JavaScript time to execute
-            
-            # Wait for the reader to load
-            if not await self.wait_for_load(".reading-content img"):
-                print("No images found")
-                return []
-            
-            # Extract image URLs
-            images = await self.page.evaluate("""
-                () => {
-                    const images = document.querySelectorAll('.reading-content img');
-                    return Array.from(images)
-                        .map(img => img.getAttribute('src') || img.getAttribute('data-src'))
-                        .filter(src => src && !src.includes('loading.gif'));
-                }
-            """)
-            
-            print(f"Found {len(images)} images")
-            return images
+            async with self.page_pool.page() as page:
+                await self.navigate(page, full_url, 'chapter_images')
+            
+                # Wait for the reader to load
+                if not await self.wait_for_load(page, ".reading-content img"):
+                    print("No images found")
+                    return []
+            
+                # Extract image URLs
+                images = await page.evaluate("""
+                    () => {
+                        const images = document.querySelectorAll('.reading-content img');
+                        return Array.from(images)
+                            .map(img => img.getAttribute('src') || img.getAttribute('data-src'))
+                            .filter(src => src && !src.includes('loading.gif'));
+                    }
+                """)
+            
+                print(f"Found {len(images)} images")
+                return images
             
         except Exception as e:
             print(f"Error getting chapter images: {e}")
             return []
 
+    async def get_chapter_images_bulk(self, chapter_urls: List[str]) -> List[List[str]]:
+        """Get image URLs for many chapters, using every page in the pool in parallel"""
+        return await asyncio.gather(*(self.get_chapter_images(url) for url in chapter_urls))
+
     async def get_manhwa_details(self, url: str) -> Dict:
         """Get detailed information about a specific manhwa"""
         print(f"Getting manhwa details from {url}")
         full_url = urljoin(self.base_url, url)
         
         try:
-            await self.page.goto(full_url, wait_until="networkidle", timeout=60000)
-            await asyncio.sleep(2)  # Give JavaScript time to execute
-            
-            # Wait for content to load
-            if not await self.wait_for_load(".tt"):
-                print("No manhwa details found")
-                return {}
-            
-            # Extract manhwa details
-            details = await self.page.evaluate("""
-                () => {
-                    const title = document.querySelector('.tt')?.textContent.trim();
-                    const description = document.querySelector('.entry-content')?.textContent.trim();
-                    const coverImg = document.querySelector('.thumb img');
-                    const genreEls = document.querySelectorAll('.genres a');
-                    const statusEl = document.querySelector('.status');
-                    const ratingEl = document.querySelector('.rating');
+            async with self.page_pool.page() as page:
+                await self.navigate(page, full_url, 'series_details')
+            
+                # Wait for content to load
+                if not await self.wait_for_load(page, ".tt"):
+                    print("No manhwa details found")
+                    return {}
+            
+                # Extract manhwa details
+                details = await page.evaluate("""
+                    () => {
+                        const title = document.querySelector('.tt')?.textContent.trim();
+                        const description = document.querySelector('.entry-content')?.textContent.trim();
+                        const coverImg = document.querySelector('.thumb img');
+                        const genreEls = document.querySelectorAll('.genres a');
+                        const statusEl = document.querySelector('.status');
+                        const ratingEl = document.querySelector('.rating');
                     
-                    return {
-                        title: title || '',
-                        description: description || '',
-                        cover_url: coverImg ? coverImg.getAttribute('src') : null,
-                        genres: Array.from(genreEls).map(el => el.textContent.trim()),
-                        status: statusEl ? statusEl.textContent.trim().toLowerCase() : 'ongoing',
-                        rating: ratingEl ? parseFloat(ratingEl.textContent) : 0.0
-                    };
-                }
-            """)
+                        return {
+                            title: title || '',
+                            description: description || '',
+                            cover_url: coverImg ? coverImg.getAttribute('src') : null,
+                            genres: Array.from(genreEls).map(el => el.textContent.trim()),
+                            status: statusEl ? statusEl.textContent.trim().toLowerCase() : 'ongoing',
+                            rating: ratingEl ? parseFloat(ratingEl.textContent) : 0.0
+                        };
+                    }
+                """)
             
             # Get chapters
             chapters = await self.get_chapter_list(url)
@@ -0,0 +1,213 @@
+import asyncio
+import json
+import os
+import time
+import logging
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+# Latency buckets in seconds, from fast API calls up to slow browser navigations
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        """Cumulative histogram in the Prometheus sense"""
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+class MetricsRegistry:
+    def __init__(self):
+        """In-process counters, gauges and histograms shared by the scrapers
+
+        Everything is exposed either as Prometheus text (render_prometheus /
+        serve) or as a JSON snapshot written periodically (write_snapshots).
+        """
+        self.started_at = time.time()
+        self.counters: Dict[str, Dict[LabelKey, float]] = {}
+        self.gauges: Dict[str, Dict[LabelKey, float]] = {}
+        self.gauge_callbacks: Dict[str, Dict[LabelKey, Callable[[], float]]] = {}
+        self.histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+
+    @staticmethod
+    def label_key(labels: Dict[str, str]) -> LabelKey:
+        return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels: str):
+        """Increase a counter"""
+        series = self.counters.setdefault(name, {})
+        key = self.label_key(labels)
+        series[key] = series.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels: str):
+        """Set a gauge to a value"""
+        self.gauges.setdefault(name, {})[self.label_key(labels)] = value
+
+    def register_gauge(self, name: str, callback: Callable[[], float], **labels: str):
+        """Read a gauge from a callback (e.g. a queue size) whenever metrics are collected"""
+        self.gauge_callbacks.setdefault(name, {})[self.label_key(labels)] = callback
+
+    def unregister_gauge(self, name: str, **labels: str):
+        self.gauge_callbacks.get(name, {}).pop(self.label_key(labels), None)
+
+    def observe(self, name: str, value: float, **labels: str):
+        """Record a value (usually seconds) in a histogram"""
+        series = self.histograms.setdefault(name, {})
+        key = self.label_key(labels)
+        if key not in series:
+            series[key] = Histogram()
+        series[key].observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels: str) -> Iterator[None]:
+        """Observe the duration of a block, including any awaits inside it"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def collect_gauges(self) -> Dict[str, Dict[LabelKey, float]]:
+        gauges = {name: dict(series) for name, series in self.gauges.items()}
+        for name, callbacks in self.gauge_callbacks.items():
+            for key, callback in callbacks.items():
+                try:
+                    gauges.setdefault(name, {})[key] = float(callback())
+                except Exception as e:
+                    logger.warning(f"Error reading gauge {name}: {e}")
+        return gauges
+
+    @staticmethod
+    def format_labels(key: LabelKey, extra: Optional[Dict[str, str]] = None) -> str:
+        pairs = list(key) + sorted((extra or {}).items())
+        if not pairs:
+            return ''
+        escaped = []
+        for label, value in pairs:
+            value = value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+            escaped.append(f'{label}="{value}"')
+        return '{' + ','.join(escaped) + '}'
+
+    def render_prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format"""
+        lines: List[str] = []
+
+        for name, series in sorted(self.counters.items()):
+            lines.append(f"# TYPE {name} counter")
+            for key, value in series.items():
+                lines.append(f"{name}{self.format_labels(key)} {value}")
+
+        for name, series in sorted(self.collect_gauges().items()):
+            lines.append(f"# TYPE {name} gauge")
+            for key, value in series.items():
+                lines.append(f"{name}{self.format_labels(key)} {value}")
+
+        for name, series in sorted(self.histograms.items()):
+            lines.append(f"# TYPE {name} histogram")
+            for key, histogram in series.items():
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    lines.append(f"{name}_bucket{self.format_labels(key, {'le': str(bound)})} {count}")
+                lines.append(f"{name}_bucket{self.format_labels(key, {'le': '+Inf'})} {histogram.count}")
+                lines.append(f"{name}_sum{self.format_labels(key)} {histogram.sum}")
+                lines.append(f"{name}_count{self.format_labels(key)} {histogram.count}")
+
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self) -> Dict:
+        """JSON-friendly view of all metrics, with per-second rates for counters"""
+        uptime = max(time.time() - self.started_at, 1e-9)
+
+        def labelled(key: LabelKey) -> Dict[str, str]:
+            return dict(key)
+
+        return {
+            'timestamp': time.time(),
+            'uptime_seconds': uptime,
+            'counters': {
+                name: [
+                    {'labels': labelled(key), 'value': value, 'per_second': value / uptime}
+                    for key, value in series.items()
+                ]
+                for name, series in self.counters.items()
+            },
+            'gauges': {
+                name: [{'labels': labelled(key), 'value': value} for key, value in series.items()]
+                for name, series in self.collect_gauges().items()
+            },
+            'histograms': {
+                name: [
+                    {
+                        'labels': labelled(key),
+                        'count': histogram.count,
+                        'sum': histogram.sum,
+                        'mean': histogram.sum / histogram.count if histogram.count else 0.0,
+                        'buckets': dict(zip((str(bound) for bound in histogram.buckets), histogram.counts)),
+                    }
+                    for key, histogram in series.items()
+                ]
+                for name, series in self.histograms.items()
+            },
+        }
+
+    def write_snapshot(self, path: str):
+        """Atomically write the current snapshot as JSON"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.snapshot(), f, indent=2)
+        os.replace(tmp_path, path)
+
+    async def write_snapshots(self, path: str, interval: float = 15.0):
+        """Write a snapshot every interval seconds until cancelled"""
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                self.write_snapshot(path)
+        finally:
+            self.write_snapshot(path)
+
+    async def serve(self, host: str = '0.0.0.0', port: int = 9108):
+        """Serve /metrics in Prometheus format; returns the runner to clean up"""
+        from aiohttp import web
+
+        async def handle_metrics(request: web.Request) -> web.Response:
+            return web.Response(text=self.render_prometheus(), content_type='text/plain', charset='utf-8')
+
+        app = web.Application()
+        app.router.add_get('/metrics', handle_metrics)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        logger.info(f"Serving metrics on http://{host}:{port}/metrics")
+        return runner
+
+    @asynccontextmanager
+    async def exporting(self, port: Optional[int] = None, snapshot_path: Optional[str] = None) -> AsyncIterator[None]:
+        """Serve /metrics on port and/or write JSON snapshots to snapshot_path while the block runs"""
+        runner = await self.serve(port=port) if port else None
+        snapshot_task = asyncio.create_task(self.write_snapshots(snapshot_path)) if snapshot_path else None
+        try:
+            yield
+        finally:
+            if snapshot_task:
+                snapshot_task.cancel()
+                await asyncio.gather(snapshot_task, return_exceptions=True)
+            if runner:
+                await runner.cleanup()
+
+
+# Shared registry used by all scrapers in the process
+metrics = MetricsRegistry()
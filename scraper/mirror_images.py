@@ -0,0 +1,113 @@
+import argparse
+import asyncio
+import logging
+import os
+from typing import Optional
+from supabase import create_client, Client
+from image_mirror import ImageMirror, LocalImageStore, SupabaseImageStore
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Initialize Supabase client
+supabase_url = os.getenv("SUPABASE_URL")
+supabase_key = os.getenv("SUPABASE_KEY")
+
+if not supabase_url or not supabase_key:
+    raise ValueError("Please set SUPABASE_URL and SUPABASE_KEY environment variables")
+
+supabase: Client = create_client(supabase_url, supabase_key)
+
+def update_row(table: str, row_id: str, values: dict) -> bool:
+    try:
+        supabase.table(table).update(values).eq('id', row_id).execute()
+        return True
+    except Exception as e:
+        print(f"Error updating {table} {row_id}: {e}")
+        return False
+
+async def mirror_column(mirror: ImageMirror, table: str, column: str, batch_size: int, referer: Optional[str] = None) -> int:
+    """Mirror the images in one column of a table and point the rows at the copies
+
+    Rows are read in id order with a cursor kept in the mirror index, so
+    an interrupted run picks up where it stopped; rows that already point
+    at the store only cost a lookup. Array columns (chapters.pages) are
+    mirrored element by element.
+    """
+    cursor_name = f"{table}.{column}"
+    after = mirror.cursor(cursor_name)
+    if after:
+        print(f"Resuming {cursor_name} after {after}")
+
+    updated = 0
+    while True:
+        # Empty arrays/strings and NULLs are all filtered out by neq
+        query = supabase.table(table).select(f"id,{column}").neq(column, '{}' if column == 'pages' else '')
+        if after:
+            query = query.gt('id', after)
+        rows = (await asyncio.to_thread(lambda: query.order('id').limit(batch_size).execute())).data
+        if not rows:
+            break
+
+        async def mirror_row(row: dict) -> bool:
+            value = row[column]
+            if isinstance(value, list):
+                mirrored = await mirror.mirror_all(value, referer)
+            else:
+                mirrored = await mirror.mirror(value, referer) or value
+            if mirrored == value:
+                return False
+            return await asyncio.to_thread(update_row, table, row['id'], {column: mirrored})
+
+        results = await asyncio.gather(*(mirror_row(row) for row in rows))
+        updated += sum(results)
+        after = rows[-1]['id']
+        mirror.set_cursor(cursor_name, after)
+        print(f"{cursor_name}: {updated} rows rewritten so far (at {after})")
+
+        if len(rows) < batch_size:
+            break
+
+    # A finished walk starts over next time, to pick up rows added since
+    mirror.set_cursor(cursor_name, None)
+    return updated
+
+async def mirror_images(args: argparse.Namespace):
+    """Mirror chapter pages and covers into the configured store"""
+    if args.store == 'supabase':
+        store = SupabaseImageStore(supabase, bucket=args.bucket, prefix=args.prefix)
+    else:
+        store = LocalImageStore(args.directory, args.public_base)
+
+    async with ImageMirror(store, index_path=args.index, concurrency=args.concurrency, per_host=args.per_host, rate=args.rate) as mirror:
+        if args.restart:
+            mirror.set_cursor('content.cover_image', None)
+            mirror.set_cursor(f"{args.chapters_table}.pages", None)
+        if not args.skip_covers:
+            covers = await mirror_column(mirror, 'content', 'cover_image', args.batch_size)
+            print(f"Rewrote {covers} cover images")
+        if not args.skip_chapters:
+            chapters = await mirror_column(mirror, args.chapters_table, 'pages', args.batch_size, args.referer)
+            print(f"Rewrote the pages of {chapters} chapters")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Mirror hot-linked chapter pages and covers into content-addressed storage')
+    parser.add_argument('--store', choices=['local', 'supabase'], default='local',
+                        help='Where mirrored images go (default: local files)')
+    parser.add_argument('--directory', default='public/mirror', help='Directory of the local store')
+    parser.add_argument('--public-base', default='/mirror', help='URL the local store directory is served at')
+    parser.add_argument('--bucket', default='content', help='Supabase Storage bucket of the supabase store')
+    parser.add_argument('--prefix', default='mirror', help='Folder inside the bucket')
+    parser.add_argument('--index', default='.image_mirror.sqlite', help='SQLite index of mirrored URLs and stored images')
+    parser.add_argument('--concurrency', type=int, default=16, help='Downloads running at once')
+    parser.add_argument('--per-host', type=int, default=4, help='Connections per image host')
+    parser.add_argument('--rate', type=float, default=10.0, help='Requests per second per image host')
+    parser.add_argument('--batch-size', type=int, default=100, help='Rows read from the database at a time')
+    parser.add_argument('--chapters-table', default='chapters', help='Table holding chapter pages')
+    parser.add_argument('--referer', help='Referer to send, for hosts that refuse hot-linking')
+    parser.add_argument('--skip-covers', action='store_true', help="Don't mirror content.cover_image")
+    parser.add_argument('--skip-chapters', action='store_true', help="Don't mirror chapter pages")
+    parser.add_argument('--restart', action='store_true', help='Start from the first row instead of resuming')
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    asyncio.run(mirror_images(parser.parse_args()))
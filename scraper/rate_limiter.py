@@ -0,0 +1,148 @@
+import asyncio
+import time
+import logging
+from email.utils import parsedate_to_datetime
+from typing import Dict, Mapping, Optional
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        """Token bucket refilled at `rate` tokens per second, holding at most `capacity`"""
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self):
+        """Wait until a token is available and take it
+
+        An unlimited bucket (rate <= 0) hands out tokens right away, but
+        still waits out a block set by block_for.
+        """
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if self.blocked_until > now:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                if self.rate <= 0:
+                    return
+
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def block_for(self, seconds: float):
+        """Hold back every request on this bucket for the given number of seconds"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+
+    def limit_remaining(self, remaining: int):
+        """Never hand out more tokens than the server says are left"""
+        self._refill(time.monotonic())
+        self.tokens = min(self.tokens, float(remaining))
+
+
+class RateLimiter:
+    def __init__(
+        self,
+        rate: float = 5.0,
+        burst: Optional[float] = None,
+        host_rates: Optional[Dict[str, float]] = None,
+        base_backoff: float = 1.0,
+        max_backoff: float = 60.0,
+    ):
+        """Per-host token bucket rate limiter
+
+        rate is the default requests per second for each host, host_rates
+        overrides it for specific hosts. The buckets adapt to
+        X-RateLimit-Remaining / X-RateLimit-Retry-After / Retry-After headers
+        passed in through update_from_response.
+        """
+        self.rate = rate
+        self.burst = burst if burst is not None else rate
+        self.host_rates = host_rates or {}
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.buckets: Dict[str, TokenBucket] = {}
+
+    def bucket_for(self, url: str) -> TokenBucket:
+        """Get (or create) the bucket for the host of a URL"""
+        host = urlparse(url).netloc
+        bucket = self.buckets.get(host)
+        if bucket is None:
+            rate = self.host_rates.get(host, self.rate)
+            bucket = TokenBucket(rate, self.burst if host not in self.host_rates else rate)
+            self.buckets[host] = bucket
+        return bucket
+
+    async def acquire(self, url: str):
+        """Wait for permission to send a request to the host of a URL"""
+        await self.bucket_for(url).acquire()
+
+    @staticmethod
+    def retry_after(headers: Mapping[str, str]) -> Optional[float]:
+        """Seconds to wait according to the response headers, if they say"""
+        value = headers.get('Retry-After')
+        if value:
+            try:
+                return max(0.0, float(value))
+            except ValueError:
+                try:
+                    return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+                except (TypeError, ValueError):
+                    pass
+
+        # MangaDex sends the unix timestamp at which the limit resets
+        value = headers.get('X-RateLimit-Retry-After')
+        if value:
+            try:
+                return max(0.0, float(value) - time.time())
+            except ValueError:
+                pass
+
+        return None
+
+    def update_from_response(self, url: str, status: int, headers: Mapping[str, str], attempt: int = 0) -> Optional[float]:
+        """Adapt the host bucket to a response
+
+        Returns the number of seconds to wait before retrying when the
+        response was a 429, None otherwise.
+        """
+        bucket = self.bucket_for(url)
+
+        if status == 429:
+            delay = self.retry_after(headers)
+            if delay is None:
+                delay = min(self.max_backoff, self.base_backoff * (2 ** attempt))
+            bucket.block_for(delay)
+            logger.warning(f"Rate limited by {urlparse(url).netloc}, backing off {delay:.1f}s")
+            return delay
+
+        remaining = headers.get('X-RateLimit-Remaining')
+        if remaining is not None:
+            try:
+                remaining_count = int(remaining)
+            except ValueError:
+                return None
+
+            if remaining_count <= 0:
+                delay = self.retry_after(headers)
+                if delay:
+                    bucket.block_for(delay)
+            else:
+                bucket.limit_remaining(remaining_count)
+
+        return None
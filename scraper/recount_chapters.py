@@ -0,0 +1,34 @@
+import os
+import sys
+from supabase import create_client, Client
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Initialize Supabase client
+supabase_url = os.getenv("SUPABASE_URL")
+supabase_key = os.getenv("SUPABASE_KEY")
+
+if not supabase_url or not supabase_key:
+    raise ValueError("Please set SUPABASE_URL and SUPABASE_KEY environment variables")
+
+supabase: Client = create_client(supabase_url, supabase_key)
+
+def recount_chapters(content_ids=None):
+    """Recount content.total_chapters from the chapters table, for all titles or the given ids
+
+    The chapters triggers keep the counts up to date with per-statement
+    deltas; this fixes any drift, e.g. after bulk loads with triggers disabled.
+    """
+    try:
+        params = {'content_ids': content_ids} if content_ids else {}
+        result = supabase.rpc('recount_content_chapters', params).execute()
+        print(f"Fixed the chapter count of {result.data} titles")
+        return True
+    except Exception as e:
+        print(f"Error recounting chapters: {e}")
+        return False
+
+if __name__ == "__main__":
+    recount_chapters(sys.argv[1:] or None)
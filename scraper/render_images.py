@@ -0,0 +1,185 @@
+import argparse
+import json
+import logging
+import os
+import sqlite3
+from typing import Dict, List, Optional
+from postgrest.types import ReturnMethod
+from supabase import create_client, Client
+from image_renditions import DEFAULT_FORMATS, WIDTHS, RenditionPool
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Initialize Supabase client
+supabase_url = os.getenv("SUPABASE_URL")
+supabase_key = os.getenv("SUPABASE_KEY")
+
+if not supabase_url or not supabase_key:
+    raise ValueError("Please set SUPABASE_URL and SUPABASE_KEY environment variables")
+
+supabase: Client = create_client(supabase_url, supabase_key)
+
+class RenditionIndex:
+    def __init__(self, path: str):
+        """Renditions already made per image hash, kept next to the mirror index"""
+        self.db = sqlite3.connect(path)
+        self.db.execute("CREATE TABLE IF NOT EXISTS renditions (digest TEXT PRIMARY KEY, renditions TEXT NOT NULL)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS cursors (name TEXT PRIMARY KEY, after TEXT NOT NULL)")
+        self.db.commit()
+
+    def lookup(self, digests: List[str]) -> Dict[str, List[Dict]]:
+        found = {}
+        for i in range(0, len(digests), 500):
+            chunk = digests[i:i + 500]
+            rows = self.db.execute(
+                f"SELECT digest, renditions FROM renditions WHERE digest IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall()
+            found.update((digest, json.loads(renditions)) for digest, renditions in rows)
+        return found
+
+    def store(self, digest: str, renditions: List[Dict]):
+        self.db.execute("INSERT OR REPLACE INTO renditions (digest, renditions) VALUES (?, ?)", (digest, json.dumps(renditions)))
+
+    def cursor(self, name: str) -> Optional[str]:
+        row = self.db.execute("SELECT after FROM cursors WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def set_cursor(self, name: str, after: Optional[str]):
+        if after is None:
+            self.db.execute("DELETE FROM cursors WHERE name = ?", (name,))
+        else:
+            self.db.execute("INSERT OR REPLACE INTO cursors (name, after) VALUES (?, ?)", (name, after))
+        self.db.commit()
+
+def rendition_rows(source_url: str, renditions: List[Dict], public_base: str) -> List[Dict]:
+    """image_renditions rows of one mirrored image"""
+    return [
+        {
+            'source_url': source_url,
+            'format': rendition['format'],
+            'width': rendition['width'],
+            'height': rendition['height'],
+            'url': f"{public_base}/{rendition['key']}",
+            'bytes': rendition['bytes'],
+        }
+        for rendition in renditions
+    ]
+
+def render_column(pool: RenditionPool, index: RenditionIndex, args: argparse.Namespace, table: str, column: str, kind: str) -> int:
+    """Render every mirrored image in one column of a table and record the renditions
+
+    Only images the mirror stored locally (URLs under public_base) are
+    rendered; hashes that already have renditions are skipped. Covers
+    also get the renditions copied onto content.cover_renditions, so
+    listings don't need a second query. Returns the number of images
+    rendered.
+    """
+    cursor_name = f"renditions:{table}.{column}"
+    after = index.cursor(cursor_name)
+    if after:
+        print(f"Resuming {cursor_name} after {after}")
+
+    prefix = args.public_base + '/'
+    columns = f"id,{column},cover_renditions" if column == 'cover_image' else f"id,{column}"
+    rendered = 0
+    while True:
+        query = supabase.table(table).select(columns).neq(column, '{}' if column == 'pages' else '')
+        if after:
+            query = query.gt('id', after)
+        rows = query.order('id').limit(args.batch_size).execute().data
+        if not rows:
+            break
+
+        urls_by_row = {
+            row['id']: [url for url in (row[column] if isinstance(row[column], list) else [row[column]]) if url and url.startswith(prefix)]
+            for row in rows
+        }
+        # The digest is the file name of the content-addressed original
+        digests = {url: os.path.splitext(os.path.basename(url))[0] for urls in urls_by_row.values() for url in urls}
+        known = index.lookup(sorted(set(digests.values())))
+        jobs, queued = [], set()
+        for url, digest in digests.items():
+            if digest not in known and digest not in queued:
+                queued.add(digest)
+                jobs.append((os.path.join(args.directory, url[len(prefix):]), digest, args.directory, WIDTHS[kind]))
+
+        new_renditions = {
+            digest: renditions for digest, renditions in pool.render(jobs) if renditions is not None
+        }
+
+        metadata = [
+            row
+            for url, digest in digests.items() if digest in new_renditions
+            for row in rendition_rows(url, new_renditions[digest], args.public_base)
+        ]
+        for i in range(0, len(metadata), 500):
+            supabase.table('image_renditions').upsert(
+                metadata[i:i + 500], on_conflict='source_url,format,width', returning=ReturnMethod.minimal
+            ).execute()
+
+        if column == 'cover_image':
+            for row in rows:
+                digest = digests.get(row['cover_image'])
+                renditions = new_renditions.get(digest) or known.get(digest)
+                if not renditions:
+                    continue
+                cover_renditions = [
+                    {key: rendition[key] for key in ('format', 'width', 'height', 'url')}
+                    for rendition in rendition_rows(row['cover_image'], renditions, args.public_base)
+                ]
+                if row.get('cover_renditions') != cover_renditions:
+                    supabase.table('content').update({'cover_renditions': cover_renditions}).eq('id', row['id']).execute()
+
+        # Only recorded once their rows are written, so a failed or interrupted run renders them again
+        for digest, renditions in new_renditions.items():
+            index.store(digest, renditions)
+        index.db.commit()
+        rendered += len(new_renditions)
+
+        after = rows[-1]['id']
+        index.set_cursor(cursor_name, after)
+        print(f"{cursor_name}: rendered {rendered} images so far (at {after})")
+
+        if len(rows) < args.batch_size:
+            break
+
+    # A finished walk starts over next time, to pick up rows added since
+    index.set_cursor(cursor_name, None)
+    return rendered
+
+def render_images(args: argparse.Namespace):
+    """Render covers and chapter pages mirrored into the local store"""
+    index = RenditionIndex(args.index)
+    if args.restart:
+        index.set_cursor('renditions:content.cover_image', None)
+        index.set_cursor(f"renditions:{args.chapters_table}.pages", None)
+
+    with RenditionPool(args.processes, args.formats) as pool:
+        print(f"Rendering {', '.join(pool.formats)} with {pool.processes} processes")
+        if not args.skip_covers:
+            covers = render_column(pool, index, args, 'content', 'cover_image', 'cover')
+            print(f"Rendered {covers} cover images")
+        if not args.skip_pages:
+            pages = render_column(pool, index, args, args.chapters_table, 'pages', 'page')
+            print(f"Rendered {pages} chapter pages")
+    index.db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Render resized WebP/AVIF versions of mirrored covers and chapter pages')
+    parser.add_argument('--directory', default='public/mirror', help='Directory of the local mirror store')
+    parser.add_argument('--public-base', default='/mirror', help='URL the local store directory is served at')
+    parser.add_argument('--index', default='.image_mirror.sqlite', help='SQLite index of the mirror, also used to track renditions')
+    parser.add_argument('--processes', type=int, help='Worker processes (default: one per core)')
+    parser.add_argument('--formats', nargs='+', choices=['webp', 'avif'], default=list(DEFAULT_FORMATS),
+                        help='Formats to render (default: webp, plus avif when pillow-avif-plugin is installed)')
+    parser.add_argument('--batch-size', type=int, default=100, help='Rows read from the database at a time')
+    parser.add_argument('--chapters-table', default='chapters', help='Table holding chapter pages')
+    parser.add_argument('--skip-covers', action='store_true', help="Don't render content covers")
+    parser.add_argument('--skip-pages', action='store_true', help="Don't render chapter pages")
+    parser.add_argument('--restart', action='store_true', help='Start from the first row instead of resuming')
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    args = parser.parse_args()
+    args.public_base = args.public_base.rstrip('/')
+    render_images(args)
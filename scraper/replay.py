@@ -0,0 +1,216 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiohttp import web
+
+from http_cache import ResponseCache
+
+logger = logging.getLogger(__name__)
+
+
+class ReplayServer:
+    def __init__(self, fixtures_dir: str, origin: str, latency: float = 0.0, port: int = 0):
+        """Local stand-in for a remote site, serving responses recorded in a ResponseCache
+
+        Requests are looked up as origin + path + query, the same key the
+        cache used when recording. Occurrences of the origin in text bodies
+        are rewritten to this server, so absolute links (chapter URLs on
+        madarascans) keep pointing at the replay. latency is added to
+        every response to mimic a real network.
+        """
+        self.cache = ResponseCache(fixtures_dir, offline=True)
+        self.origin = origin.rstrip('/')
+        self.latency = latency
+        self.port = port
+        self.runner: Optional[web.AppRunner] = None
+        self.url = ''
+        self.served = 0
+        self.missing = 0
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        params: Dict[str, List[str]] = {}
+        for name, value in request.query.items():
+            params.setdefault(name, []).append(value)
+        entry = self.cache.lookup(f"{self.origin}{request.path}", params)
+        if not entry:
+            self.missing += 1
+            return web.Response(status=404, text='not recorded')
+
+        self.served += 1
+        body = entry['body']
+        content_type = entry['headers'].get('content-type', 'application/octet-stream')
+        if content_type.startswith(('text/', 'application/json')):
+            body = body.replace(self.origin.encode(), self.url.encode())
+        return web.Response(status=entry['status'], body=body, headers={'Content-Type': content_type})
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_get('/{tail:.*}', self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', self.port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}"
+        logger.info(f"Replaying {self.origin} on {self.url}")
+        return self.url
+
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
+        self.cache.close()
+
+
+class FakePostgrest:
+    def __init__(self, latency: float = 0.0, port: int = 0):
+        """In-memory stand-in for Supabase's PostgREST endpoint
+
+        Supports what the importers use: select with eq./in. filters and
+        limit/offset/Range paging, insert, upsert (on_conflict) and update.
+        Point a Supabase client at url with any JWT-shaped key.
+        """
+        self.latency = latency
+        self.port = port
+        self.tables: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.runner: Optional[web.AppRunner] = None
+        self.url = ''
+        self.read_requests = 0
+        self.write_requests = 0
+        self.rows_written: Dict[str, int] = {}
+
+    @staticmethod
+    def parse_filters(request: web.Request) -> List[Tuple[str, str, Any]]:
+        filters = []
+        for name, value in request.query.items():
+            if name in ('select', 'limit', 'offset', 'on_conflict', 'order', 'columns'):
+                continue
+            operator, _, operand = value.partition('.')
+            if operator == 'in':
+                items = [item.strip().strip('"') for item in operand.strip('()').split(',') if item]
+                filters.append((name, 'in', set(items)))
+            elif operator == 'eq':
+                filters.append((name, 'eq', operand))
+        return filters
+
+    def matching(self, table: str, filters: List[Tuple[str, str, Any]]) -> List[Dict[str, Any]]:
+        rows = []
+        for row in self.tables.get(table, {}).values():
+            for column, operator, operand in filters:
+                value = '' if row.get(column) is None else str(row.get(column))
+                if operator == 'eq' and value != operand:
+                    break
+                if operator == 'in' and value not in operand:
+                    break
+            else:
+                rows.append(row)
+        return rows
+
+    @staticmethod
+    def project(rows: List[Dict[str, Any]], select: Optional[str]) -> List[Dict[str, Any]]:
+        if not select or select == '*':
+            return rows
+        columns = [column.strip() for column in select.split(',')]
+        return [{column: row.get(column) for column in columns} for row in rows]
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        table = request.match_info['table']
+        filters = self.parse_filters(request)
+        prefer = request.headers.get('Prefer', '')
+
+        if request.method == 'GET':
+            self.read_requests += 1
+            rows = self.matching(table, filters)
+            offset = int(request.query.get('offset', 0))
+            limit = request.query.get('limit')
+            if 'Range' in request.headers:
+                start, _, end = request.headers['Range'].partition('-')
+                offset, limit = int(start), int(end) - int(start) + 1
+            rows = rows[offset:offset + int(limit)] if limit is not None else rows[offset:]
+            return web.json_response(self.project(rows, request.query.get('select')))
+
+        self.write_requests += 1
+        stored: List[Dict[str, Any]] = []
+
+        if request.method == 'POST':
+            payload = await request.json()
+            conflict_column = request.query.get('on_conflict')
+            for row in payload if isinstance(payload, list) else [payload]:
+                existing = None
+                if conflict_column and 'merge-duplicates' in prefer:
+                    matches = self.matching(table, [(conflict_column, 'eq', str(row.get(conflict_column)))])
+                    existing = matches[0] if matches else None
+                if existing:
+                    existing.update(row)
+                    stored.append(existing)
+                else:
+                    row = {'id': str(uuid.uuid4()), **row}
+                    self.tables.setdefault(table, {})[row['id']] = row
+                    stored.append(row)
+        elif request.method == 'PATCH':
+            changes = await request.json()
+            for row in self.matching(table, filters):
+                row.update(changes)
+                stored.append(row)
+        elif request.method == 'DELETE':
+            for row in self.matching(table, filters):
+                del self.tables[table][row['id']]
+                stored.append(row)
+
+        self.rows_written[table] = self.rows_written.get(table, 0) + len(stored)
+        status = 201 if request.method == 'POST' else 200
+        if 'return=minimal' in prefer:
+            return web.Response(status=status, text='')
+        return web.json_response(stored, status=status)
+
+    async def start(self) -> str:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_route('*', '/rest/v1/{table}', self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', self.port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}"
+        logger.info(f"Fake PostgREST on {self.url}")
+        return self.url
+
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
+
+
+# Any JWT-shaped string passes the Supabase client's key check
+FAKE_SUPABASE_KEY = 'eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.benchmark'
+
+
+class Stopwatch:
+    def __init__(self):
+        self.started_at = time.perf_counter()
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started_at
+
+
+def rates(elapsed: float, **counts: float) -> Dict[str, Any]:
+    """Counts plus per-second rates, for benchmark reports"""
+    report: Dict[str, Any] = {'elapsed_seconds': round(elapsed, 3)}
+    for name, count in counts.items():
+        report[name] = count
+        report[f"{name}_per_second"] = round(count / elapsed, 2) if elapsed else 0.0
+    return report
+
+
+def print_report(name: str, report: Dict[str, Any]):
+    print(f"\n== {name} ==")
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,92 @@
+import logging
+from typing import Iterable, Optional, Union
+from urllib.parse import urlparse
+
+from playwright.async_api import BrowserContext, Page, Route
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Resource types the scrapers never need: we only read src/data-src attributes
+DEFAULT_BLOCKED_TYPES = ('image', 'media', 'font')
+
+# Ad and analytics hosts that are blocked whatever the resource type
+DEFAULT_BLOCKED_HOSTS = (
+    'google-analytics.com',
+    'googletagmanager.com',
+    'googlesyndication.com',
+    'doubleclick.net',
+    'adservice.google.com',
+    'facebook.net',
+    'hotjar.com',
+    'disqus.com',
+    'histats.com',
+    'popads.net',
+    'onclickads.net',
+)
+
+# Third-party hosts whose scripts must keep running (challenge pages)
+DEFAULT_ALLOWED_SCRIPT_HOSTS = (
+    'challenges.cloudflare.com',
+    'cdnjs.cloudflare.com',
+)
+
+
+def host_matches(host: str, domains: Iterable[str]) -> bool:
+    """Whether host is one of domains or a subdomain of one"""
+    return any(host == domain or host.endswith('.' + domain) for domain in domains)
+
+
+class ResourcePolicy:
+    def __init__(
+        self,
+        blocked_types: Iterable[str] = DEFAULT_BLOCKED_TYPES,
+        blocked_hosts: Iterable[str] = DEFAULT_BLOCKED_HOSTS,
+        block_third_party_scripts: bool = True,
+        allowed_script_hosts: Iterable[str] = DEFAULT_ALLOWED_SCRIPT_HOSTS,
+    ):
+        """Which requests a scraper's browser should abort
+
+        blocked_types are Playwright resource types (image, media, font,
+        stylesheet, ...). Scripts from hosts other than the site being
+        scraped are blocked when block_third_party_scripts is set, except
+        for allowed_script_hosts.
+        """
+        self.blocked_types = set(blocked_types)
+        self.blocked_hosts = tuple(blocked_hosts)
+        self.block_third_party_scripts = block_third_party_scripts
+        self.allowed_script_hosts = tuple(allowed_script_hosts)
+
+    def should_block(self, url: str, resource_type: str, site_host: str) -> bool:
+        host = urlparse(url).hostname or ''
+        # Ad and analytics iframes are documents too, so hosts are checked first
+        if host_matches(host, self.blocked_hosts):
+            return True
+        if resource_type == 'document':
+            return False
+        if resource_type in self.blocked_types:
+            return True
+        if resource_type == 'script' and self.block_third_party_scripts:
+            site_domain = site_host[4:] if site_host.startswith('www.') else site_host
+            if not host_matches(host, (site_domain,)) and not host_matches(host, self.allowed_script_hosts):
+                return True
+        return False
+
+    async def install(self, target: Union[Page, BrowserContext], site_url: str, scraper: Optional[str] = None):
+        """Route every request of a page or context through this policy"""
+        site_host = urlparse(site_url).hostname or ''
+
+        async def handle(route: Route):
+            request = route.request
+            if self.should_block(request.url, request.resource_type, site_host):
+                metrics.inc('scraper_blocked_requests_total', scraper=scraper or site_host, resource_type=request.resource_type)
+                await route.abort()
+            else:
+                await route.continue_()
+
+        await target.route('**/*', handle)
+
+
+# Policy that lets everything through, for debugging what a page really loads
+ALLOW_ALL = ResourcePolicy(blocked_types=(), blocked_hosts=(), block_third_party_scripts=False)
@@ -1,14 +1,19 @@
+import argparse
 import asyncio
 import logging
 import random
 import time
 from datetime import datetime
 from typing import Dict, List, Optional, Any
-from playwright.async_api import async_playwright, Page, Browser, BrowserContext
+from playwright.async_api import async_playwright, Page, Browser, BrowserContext, Playwright
 import re
 from dotenv import load_dotenv
 from supabase import create_client, Client
 
+from browser_launcher import open_browser_context, close_browser_context
+from metrics import metrics
+from resource_policy import ResourcePolicy
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -26,10 +31,25 @@ USER_AGENTS = [
 ]
 
 class ThunderScraper:
-    def __init__(self):
-        """Initialize the Thunder Scans scraper"""
+    def __init__(
+        self,
+        resource_policy: Optional[ResourcePolicy] = None,
+        headless: bool = True,
+        user_data_dir: Optional[str] = None,
+        cdp_url: Optional[str] = None,
+    ):
+        """Initialize the Thunder Scans scraper
+
+        user_data_dir keeps the browser profile (including cleared Cloudflare
+        cookies) between runs, cdp_url attaches to an already running browser.
+        """
         load_dotenv('.env.local')
+        self.resource_policy = resource_policy or ResourcePolicy()
+        self.headless = headless
+        self.user_data_dir = user_data_dir
+        self.cdp_url = cdp_url
         self.base_url = "https://en-thunderscans.com"
+        self.playwright: Optional[Playwright] = None
         self.browser: Optional[Browser] = None
         self.context: Optional[BrowserContext] = None
         self.page: Optional[Page] = None
@@ -38,11 +58,14 @@ class ThunderScraper:
 
     async def setup_browser(self) -> None:
         """Set up browser with enhanced stealth settings"""
-        playwright = await async_playwright().start()
+        self.playwright = await async_playwright().start()
         
-        # Launch browser with additional arguments
-        self.browser = await playwright.chromium.launch(
-            headless=False,
+        # Launch (or attach to) the browser with stealth context settings
+        self.browser, self.context = await open_browser_context(
+            self.playwright,
+            headless=self.headless,
+            user_data_dir=self.user_data_dir,
+            cdp_url=self.cdp_url,
             args=[
                 '--disable-blink-features=AutomationControlled',
                 '--disable-features=IsolateOrigins,site-per-process',
@@ -50,22 +73,20 @@ class ThunderScraper:
                 '--disable-gpu',
                 '--no-sandbox',
                 '--window-size=1920,1080',
-            ]
-        )
-        
-        # Create context with enhanced stealth settings
-        self.context = await self.browser.new_context(
-            viewport={'width': 1920, 'height': 1080},
-            user_agent=random.choice(USER_AGENTS),
-            bypass_csp=True,
-            extra_http_headers={
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                'Accept-Language': 'en-US,en;q=0.5',
-                'Sec-Fetch-Dest': 'document',
-                'Sec-Fetch-Mode': 'navigate',
-                'Sec-Fetch-Site': 'none',
-                'Sec-Fetch-User': '?1',
-                'Upgrade-Insecure-Requests': '1',
+            ],
+            context_options={
+                'viewport': {'width': 1920, 'height': 1080},
+                'user_agent': random.choice(USER_AGENTS),
+                'bypass_csp': True,
+                'extra_http_headers': {
+                    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+                    'Accept-Language': 'en-US,en;q=0.5',
+                    'Sec-Fetch-Dest': 'document',
+                    'Sec-Fetch-Mode': 'navigate',
+                    'Sec-Fetch-Site': 'none',
+                    'Sec-Fetch-User': '?1',
+                    'Upgrade-Insecure-Requests': '1',
+                }
             }
         )
         
@@ -102,6 +123,9 @@ class ThunderScraper:
             );
         """)
         
+        # Skip images, fonts, media, ads and third-party scripts
+        await self.resource_policy.install(self.context, self.base_url, 'thunder')
+        
         self.page = await self.context.new_page()
         
         # Add additional page configurations
@@ -136,6 +160,7 @@ class ThunderScraper:
             
             for selector in cloudflare_selectors:
                 if await self.page.query_selector(selector):
+                    metrics.inc('scraper_challenges_total', scraper='thunder')
                     logger.info(f"Cloudflare challenge detected ({selector})")
                     logger.info("Waiting for manual completion...")
                     
@@ -157,26 +182,39 @@ class ThunderScraper:
             logger.error(f"Error handling Cloudflare: {e}")
             return False
 
-    async def safe_navigate(self, url: str, max_retries: int = 3) -> bool:
-        """Safely navigate to a URL with retries and error handling"""
+    async def safe_navigate(self, url: str, max_retries: int = 3, ready_selector: Optional[str] = None) -> bool:
+        """Safely navigate to a URL with retries and error handling
+
+        When ready_selector is given the page counts as loaded once it is in
+        the DOM, instead of waiting for the network to go idle.
+        """
         for attempt in range(max_retries):
             try:
                 logger.info(f"Navigating to {url} (attempt {attempt + 1}/{max_retries})")
                 
                 # Random delay between attempts
                 if attempt > 0:
+                    metrics.inc('scraper_retries_total', scraper='thunder', endpoint='page')
                     delay = random.uniform(2, 5) * attempt
                     logger.info(f"Waiting {delay:.1f} seconds before retry...")
                     await asyncio.sleep(delay)
                 
                 # Navigate to the page
-                response = await self.page.goto(url, wait_until='domcontentloaded')
+                with metrics.timer('scraper_request_seconds', scraper='thunder', endpoint='page'):
+                    response = await self.page.goto(url, wait_until='domcontentloaded')
+                metrics.inc('scraper_requests_total', scraper='thunder', endpoint='page',
+                            status=str(response.status) if response else 'none')
                 
                 if not response:
                     logger.error("No response received")
                     continue
                 
+                content_length = response.headers.get('content-length')
+                if content_length and content_length.isdigit():
+                    metrics.inc('scraper_bytes_downloaded_total', int(content_length), scraper='thunder', endpoint='page')
+                
                 if response.status == 403:
+                    metrics.inc('scraper_blocked_total', scraper='thunder')
                     logger.warning("Received 403 Forbidden - possible blocking")
                     # Take screenshot for debugging
                     await self.page.screenshot(path=f'error_403_{datetime.now().strftime("%Y%m%d_%H%M%S")}.png')
@@ -186,8 +224,10 @@ class ThunderScraper:
                 if not await self.handle_cloudflare():
                     continue
                 
-                # Wait for network to be idle
-                await self.page.wait_for_load_state('networkidle')
+                if ready_selector:
+                    await self.page.wait_for_selector(ready_selector, state='attached', timeout=30000)
+                else:
+                    await self.page.wait_for_load_state('networkidle')
                 
                 return True
                 
@@ -208,8 +248,11 @@ class ThunderScraper:
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """Close browser"""
-        if self.browser:
-            await self.browser.close()
+        if self.page and self.cdp_url:
+            await self.page.close()
+        await close_browser_context(self.browser, self.context, attached=bool(self.cdp_url))
+        if self.playwright:
+            await self.playwright.stop()
 
     async def analyze_site_structure(self):
         """Analyze the site structure and navigation"""
@@ -217,7 +260,7 @@ class ThunderScraper:
             logger.info("Starting site structure analysis...")
             
             # Attempt to navigate to main page
-            if not await self.safe_navigate(self.base_url):
+            if not await self.safe_navigate(self.base_url, ready_selector='nav, .menu, .navbar, header'):
                 logger.error("Failed to access the site")
                 return None
             
@@ -273,17 +316,33 @@ class ThunderScraper:
             await self.page.screenshot(path=f'error_screenshot_{datetime.now().strftime("%Y%m%d_%H%M%S")}.png')
             return None
 
+def parse_args() -> argparse.Namespace:
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Thunder Scans reconnaissance")
+    parser.add_argument('--headful', action='store_true', help="Show the browser (for solving challenges by hand)")
+    parser.add_argument('--user-data-dir', help="Persistent browser profile directory")
+    parser.add_argument('--cdp-url', help="Attach to a running browser, e.g. http://localhost:9222")
+    parser.add_argument('--metrics-port', type=int, help="Serve Prometheus metrics on this port")
+    parser.add_argument('--metrics-file', help="Periodically write a JSON metrics snapshot to this file")
+    return parser.parse_args()
+
 async def main():
     """Main entry point for reconnaissance"""
+    args = parse_args()
     try:
-        async with ThunderScraper() as scraper:
+        async with metrics.exporting(args.metrics_port, args.metrics_file), ThunderScraper(
+            headless=not args.headful,
+            user_data_dir=args.user_data_dir,
+            cdp_url=args.cdp_url,
+        ) as scraper:
             logger.info("Starting Thunder Scans reconnaissance...")
             structure = await scraper.analyze_site_structure()
             
             if structure:
                 logger.info("\nReconnaissance completed successfully!")
                 logger.info("Press Enter to exit...")
-                input()
+                # Off the event loop, so metrics keep being served while waiting
+                await asyncio.to_thread(input)
             else:
                 logger.error("Failed to analyze site structure")
             